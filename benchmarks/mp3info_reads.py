@@ -0,0 +1,86 @@
+"""Compares reading tags and length of mp3 files with mutagen (EasyID3 + MP3, the previous way)
+and with mp3info: bytes read from the files (from /proc/self/io, Linux only), time and results.
+Synthetic files are generated: CBR with a cover image, VBR with a Xing/LAME header, ID3v2.3 tags.
+Usage: python benchmarks/mp3info_reads.py [file count]"""
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mutagen.easyid3 import EasyID3  # noqa: E402
+from mutagen.id3 import ID3, APIC, TALB, TDRC, TIT2, TPE1, TPOS, TRCK  # noqa: E402
+from mutagen.mp3 import MP3  # noqa: E402
+
+from musicplayer import mp3info  # noqa: E402
+
+
+FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413  # MPEG-1 layer III, 128 kbps, 44.1 kHz
+
+
+def xingFrame(frames: int) -> bytes:
+    frame = bytearray(FRAME)
+    header = (b"Xing" + struct.pack(">IIII", 0xf, frames, frames * len(FRAME), 0)[:12] + bytes(100)
+              + struct.pack(">I", 50) + b"LAME3.100" + bytes(12) + (576 << 12 | 1000).to_bytes(3, "big"))
+    frame[36:36 + len(header)] = header
+    return bytes(frame)
+
+
+def writeFiles(directory: str, count: int) -> list:
+    paths = []
+    for n in range(count):
+        path = os.path.join(directory, f"{n:05}.mp3")
+        kind = n % 3
+        with open(path, "wb") as fh:
+            fh.write(xingFrame(9000) if kind == 1 else FRAME)
+            fh.write(FRAME * 2000)  # ~0.8 MB of audio
+        tags = ID3()
+        if kind == 0:
+            tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="Cover", data=os.urandom(150_000)))
+        for frame in [TPE1(text=f"Artist {n // 50}"), TALB(text=f"Album {n // 10}"), TDRC(text="2004"),
+                      TIT2(text=f"Song {n}"), TRCK(text=f"{n % 10 + 1}/10"), TPOS(text="1/1")]:
+            frame.encoding = 1 if kind == 2 else 3
+            tags.add(frame)
+        tags.save(path, v2_version=3 if kind == 2 else 4)
+        paths.append(path)
+    return paths
+
+
+def bytesRead() -> int:
+    with open("/proc/self/io") as fh:
+        return int(next(line for line in fh if line.startswith("rchar")).split()[1])
+
+
+def withMutagen(path: str) -> tuple:
+    tags = EasyID3(path)
+    return {key: list(tags[key]) for key in tags.keys()}, MP3(path).info.length
+
+
+def withMP3Info(path: str) -> tuple:
+    info = mp3info.MP3Info(path)
+    return info.tags, info.length
+
+
+def measure(reader, paths: list) -> tuple:
+    before = bytesRead()
+    start = time.perf_counter()
+    results = [reader(path) for path in paths]
+    return time.perf_counter() - start, bytesRead() - before, results
+
+
+def main(count: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        paths = writeFiles(directory, count)
+        size = sum(os.path.getsize(path) for path in paths)
+        print(f"{count} files, {size / 2**20:.1f} MB")
+        mutagenTime, mutagenBytes, expected = measure(withMutagen, paths)
+        infoTime, infoBytes, results = measure(withMP3Info, paths)
+        for name, seconds, read in [("mutagen", mutagenTime, mutagenBytes), ("mp3info", infoTime, infoBytes)]:
+            print(f"{name:>8}: {read / count / 1024:>8.1f} KB read per file, {seconds / count * 1000:.2f} ms per file")
+        print("identical results:", results == expected)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,45 @@
+"""Measures the memory taken by the song entries of the library (Library._files) with tracemalloc,
+comparing lists of seven strings, the previous representation, with the Song records.
+Usage: python benchmarks/song_memory.py [track count ...]"""
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from musicplayer.library import Song  # noqa: E402
+
+
+def tags(trackCount: int):
+    """Yields (path, values) for a synthetic library with 10 songs per album and 5 albums per artist.
+    Every string is a separate object, as if decoded from the library file or read from the tags."""
+    for n in range(trackCount):
+        artist, album, track = n // 50, n // 10, n % 10
+        path = f"C:\\Music\\Artist {artist}\\Album {album}\\{track + 1:02} - Song number {n}.mp3"
+        yield path, [f"Artist {artist}", f"Album {album}", str(1960 + album % 60), f"Song number {n}",
+                     f"{track + 1:02}", "1", f"0{track % 10}:{n % 60:02}"]
+
+
+def measure(trackCount: int, record) -> int:
+    """Returns the number of bytes allocated by a dictionary of trackCount song entries."""
+    gc.collect()
+    tracemalloc.start()
+    files = {path: record(values) for path, values in tags(trackCount)}
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del files
+    return size
+
+
+def main(trackCounts: list) -> None:
+    print(f"{'tracks':>10} {'lists':>12} {'Song':>12} {'saved':>8} {'per track':>18}")
+    for trackCount in trackCounts:
+        lists = measure(trackCount, list)
+        songs = measure(trackCount, Song)
+        print(f"{trackCount:>10} {lists / 2**20:>10.1f}MB {songs / 2**20:>10.1f}MB "
+              f"{1 - songs / lists:>7.0%} {lists // trackCount:>8}B -> {songs // trackCount}B")
+
+
+if __name__ == "__main__":
+    main([int(argument) for argument in sys.argv[1:]] or [100_000, 1_000_000])
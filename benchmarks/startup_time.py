@@ -0,0 +1,75 @@
+"""Measures the part of the start-up the library takes until the player is interactive: loading
+the library file (with its tag cache next to it), listing artists, albums and playlists for the grids
+and sorting the songs of the restored view. Every run is a fresh process, as the player's start-up is.
+Usage: python benchmarks/startup_time.py [track count] [runs]"""
+import datetime
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def writeLibrary(path: str, trackCount: int) -> None:
+    """A synthetic library with 10 songs per album, 5 albums per artist, a playlist and a tag cache
+    with the songs of a folder removed from the library, a tenth of the library's size."""
+    from musicplayer import libraryfile
+
+    data = libraryfile.LibraryData()
+    data.timestamp = datetime.datetime.now()
+    data.folders = ["C:\\Music"]
+    for n in range(trackCount):
+        artist, album, track = n // 50, n // 10, n % 10
+        song = f"C:\\Music\\Artist {artist}\\Album {album}\\{track + 1:02} - Song number {n}.mp3"
+        data.files[song] = [f"Artist {artist}", f"Album {album}", str(1960 + album % 60), f"Song number {n}",
+                            f"{track + 1:02}", "1", f"0{track % 10}:{n % 60:02}"]
+        data.fingerprints[song] = (5_000_000 + n, 1_600_000_000_000_000_000 + n, 1000 + n)
+    for artist in range(trackCount // 50):
+        data.directories[f"C:\\Music\\Artist {artist}"] = (1, [])
+    data.playlists = {"Favourites": list(data.files)[::100]}
+    libraryfile.write(path, data)
+    removed = list(zip(data.fingerprints.values(), data.files.values()))[:trackCount // 10]
+    libraryfile.writeTagCache(f"{path}.tags", {(1, inode + trackCount, size, mtime): (0, values)
+                                               for (size, mtime, inode), values in removed})
+
+
+def measure(path: str) -> None:
+    """Run in a fresh process, prints the times of the start-up steps."""
+    start = time.perf_counter()
+    from musicplayer import library
+    imported = time.perf_counter()
+    lib = library.Library(scan=False, libraryFile=path)
+    loaded = time.perf_counter()
+    names = (lib.artists, lib.albums, lib.playlists)
+    listed = time.perf_counter()
+    lib.getSongsForArtist(names[0][len(names[0]) // 2], "Year")
+    viewed = time.perf_counter()
+    print(imported - start, loaded - imported, listed - loaded, viewed - listed, viewed - start)
+
+
+def main() -> None:
+    if sys.argv[1:2] == ["--measure"]:
+        measure(sys.argv[2])
+        return
+    trackCount = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "Library.lib")
+        writeLibrary(path, trackCount)
+        print(f"{trackCount} tracks, library file {os.path.getsize(path) / 2**20:.1f} MB, "
+              f"tag cache {os.path.getsize(path + '.tags') / 2**20:.1f} MB, median of {runs} runs")
+        results = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, __file__, "--measure", path], capture_output=True,
+                                    text=True, check=True).stdout
+            results.append([float(value) for value in output.splitlines()[-1].split()])
+    for label, values in zip(["import", "load library", "list names", "restored view", "interactive"],
+                             zip(*results)):
+        print(f"{label:>15}: {statistics.median(values) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
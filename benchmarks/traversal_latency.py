@@ -0,0 +1,92 @@
+"""Compares the directory traversal of a library scan with a single listing thread (one directory
+after another, as the recursive walk used to do) and with several listings in flight. A local temporary
+tree stands in for a network drive: os.scandir, os.stat and DirEntry.stat sleep for the given latency
+before answering, the way every call waits for a round trip on SMB/NFS.
+Usage: python benchmarks/traversal_latency.py [latency in ms] [artists] [albums per artist] [songs per album]"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from musicplayer import library  # noqa: E402
+
+
+class SlowEntry:
+    """os.DirEntry whose stat waits for the latency, is_dir is answered by the listing itself."""
+
+    def __init__(self, entry: os.DirEntry, latency: float) -> None:
+        self._entry = entry
+        self._latency = latency
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self) -> bool:
+        return self._entry.is_dir()
+
+    def stat(self) -> os.stat_result:
+        time.sleep(self._latency)
+        return self._entry.stat()
+
+
+def injectLatency(latency: float) -> tuple:
+    """Replaces os.scandir and os.stat, returns the original functions."""
+    scandir, stat = os.scandir, os.stat
+
+    def slowScandir(path: str) -> list:
+        time.sleep(latency)
+        with scandir(path) as entries:
+            return [SlowEntry(entry, latency) for entry in entries]
+
+    def slowStat(path: str, *args, **kwargs) -> os.stat_result:
+        time.sleep(latency)
+        return stat(path, *args, **kwargs)
+
+    os.scandir, os.stat = slowScandir, slowStat
+    return scandir, stat
+
+
+def makeTree(root: str, artists: int, albums: int, songs: int) -> int:
+    for artist in range(artists):
+        for album in range(albums):
+            directory = os.path.join(root, f"Artist {artist}", f"Album {album}")
+            os.makedirs(directory)
+            for song in range(songs):
+                open(os.path.join(directory, f"{song:02} Song.mp3"), "wb").close()
+    return artists * albums * songs
+
+
+def traverse(root: str, threads: int) -> tuple:
+    lib = library.Library(workers=1, scan=False, libraryFile=os.path.join(root, "bench.lib"))
+    lib.listingThreads = threads
+    lib.fullScan = True
+    start = time.perf_counter()
+    for _ in lib._traverse([root]):
+        pass
+    elapsed = time.perf_counter() - start
+    found = len(lib._pending) + len(lib._cachedTags)
+    lib._pending.clear()
+    return elapsed, found, len(lib._scannedDirectories)
+
+
+def main() -> None:
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.005
+    artists, albums, songs = [int(arg) for arg in sys.argv[2:5]] or [20, 5, 10]
+    with tempfile.TemporaryDirectory() as root:
+        count = makeTree(root, artists, albums, songs)
+        print(f"{count} files in {artists * (albums + 1) + 1} directories, {latency * 1000:.1f} ms per call")
+        original = injectLatency(latency)
+        try:
+            baseline = None
+            for threads in [1, 4, 8, 16, 32]:
+                elapsed, found, directories = traverse(root, threads)
+                baseline = baseline or elapsed
+                print(f"{threads:>3} listing threads: {elapsed:7.2f} s, {found} files, {directories} directories,"
+                      f" {baseline / elapsed:5.1f}x")
+        finally:
+            os.scandir, os.stat = original
+
+
+if __name__ == "__main__":
+    main()
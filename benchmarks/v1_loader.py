@@ -0,0 +1,157 @@
+"""Compares the bulk parser of the v1 library file format (libraryfile.readV1) with
+the original parser that read the gzip stream field by field.
+Usage: python benchmarks/v1_loader.py [track count ...]"""
+import datetime
+import gzip
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from musicplayer import libraryfile  # noqa: E402
+
+
+MAGIC = b"\x01\xff"
+
+
+def writeSynthetic(path: str, trackCount: int) -> None:
+    """Writes a v1 library file with trackCount songs, 10 songs per album and 5 albums per artist,
+    one playlist with every 100th song, directory and fingerprint sections."""
+    songs = []
+    with gzip.open(path, "wb") as fh:
+        fh.write(MAGIC)
+        fh.write(struct.pack("<h", 1))
+        fh.write(struct.pack("<14s", datetime.datetime.now().strftime(libraryfile.TIME_FORMAT).encode()))
+        folder = "C:\\Music".encode()
+        fh.write(struct.pack(f"<h{len(folder)}s", len(folder), folder))
+        fh.write(MAGIC)
+        for n in range(trackCount):
+            artist, album, track = n // 50, n // 10, n % 10
+            song = f"C:\\Music\\Artist {artist}\\Album {album}\\{track + 1:02} - Song number {n}.mp3"
+            songs.append(song)
+            toBeWritten = song.encode()
+            fh.write(struct.pack(f"<h{len(toBeWritten)}s", len(toBeWritten), toBeWritten))
+            for attrib in [f"Artist {artist}", f"Album {album}", str(1960 + album % 60),
+                           f"Song number {n}", f"{track + 1:02}", "1", f"0{track % 10}:{n % 60:02}"]:
+                toBeWritten = attrib.encode()
+                fh.write(struct.pack(f"<h{len(toBeWritten)}s", len(toBeWritten), toBeWritten))
+            fh.write(MAGIC)
+        fh.write(MAGIC)
+        fh.write(struct.pack("<h", 1))
+        fh.write(struct.pack("<h8s", 8, b"Playlist"))
+        for song in songs[::100]:
+            toBeWritten = song.encode()
+            fh.write(struct.pack(f"<h{len(toBeWritten)}s", len(toBeWritten), toBeWritten))
+        fh.write(MAGIC)
+        fh.write(MAGIC)
+        fh.write(struct.pack("<i", 1))
+        fh.write(struct.pack(f"<h{len(folder)}sqh", len(folder), folder, 1, 0))
+        fh.write(MAGIC)
+        fh.write(struct.pack("<i", len(songs)))
+        for n in range(len(songs)):
+            fh.write(struct.pack("<qqQ", 4_000_000 + n, 1_600_000_000_000_000_000 + n, n))
+
+
+def legacyReadV1(path: str) -> libraryfile.LibraryData:
+    """The original parser reading the gzip stream two bytes at a time."""
+    data = libraryfile.LibraryData()
+    data.version = 1
+    with gzip.open(path, "rb") as fh:
+        if not fh.read(2) == MAGIC:
+            raise ValueError("not a library file")
+        folderCount = fh.read(2)
+        folderCount = struct.unpack("<h", folderCount)[0]
+        timestamp = fh.read(14)
+        timestamp = struct.unpack("<14s", timestamp)[0].decode()
+        for n in range(folderCount):
+            length = fh.read(2)
+            length = struct.unpack("<h", length)[0]
+            folder = fh.read(struct.Struct(f"<{length}s").size)
+            folder = struct.unpack(f"<{length}s", folder)[0].decode("utf8")
+            data.folders.append(folder)
+        if not fh.read(2) == MAGIC:
+            raise ValueError("file corrupted")
+        while True:
+            length = fh.read(2)
+            if length == MAGIC:
+                break
+            length = struct.unpack("<h", length)[0]
+            song = fh.read(struct.Struct(f"<{length}s").size)
+            song = struct.unpack(f"<{length}s", song)[0].decode("utf8")
+            attributes = []
+            for n in range(7):
+                length = fh.read(2)
+                length = struct.unpack("<h", length)[0]
+                attrib = fh.read(struct.Struct(f"<{length}s").size)
+                attrib = struct.unpack(f"<{length}s", attrib)[0].decode("utf8")
+                attributes.append(attrib)
+            data.files[song] = attributes
+            if not fh.read(2) == MAGIC:
+                raise ValueError("file corrupted")
+        length = fh.read(2)
+        length = struct.unpack("<h", length)[0]
+        if length > 0:
+            for _ in range(length):
+                length = fh.read(2)
+                length = struct.unpack("<h", length)[0]
+                playlist = fh.read(struct.Struct(f"<{length}s").size)
+                playlist = struct.unpack(f"<{length}s", playlist)[0].decode("utf8")
+                data.playlists[playlist] = []
+                while True:
+                    length = fh.read(2)
+                    if length == MAGIC:
+                        break
+                    length = struct.unpack("<h", length)[0]
+                    song = fh.read(struct.Struct(f"<{length}s").size)
+                    song = struct.unpack(f"<{length}s", song)[0].decode("utf8")
+                    data.playlists[playlist].append(song)
+        if fh.read(2) == MAGIC:
+            dirCount = struct.unpack("<i", fh.read(4))[0]
+            for _ in range(dirCount):
+                length = struct.unpack("<h", fh.read(2))[0]
+                directory = fh.read(length).decode("utf8")
+                mtime, subdirCount = struct.unpack("<qh", fh.read(10))
+                subdirs = []
+                for _ in range(subdirCount):
+                    length = struct.unpack("<h", fh.read(2))[0]
+                    subdirs.append(os.path.join(directory, fh.read(length).decode("utf8")))
+                data.directories[directory] = (mtime, subdirs)
+        if fh.read(2) == MAGIC:
+            count = struct.unpack("<i", fh.read(4))[0]
+            fingerprint = struct.Struct("<qqQ")
+            for song, _ in zip(data.files, range(count)):
+                size, mtime, inode = fingerprint.unpack(fh.read(fingerprint.size))
+                if size >= 0:
+                    data.fingerprints[song] = (size, mtime, inode)
+    data.timestamp = datetime.datetime.strptime(timestamp, libraryfile.TIME_FORMAT)
+    return data
+
+
+def sameData(first: libraryfile.LibraryData, second: libraryfile.LibraryData) -> bool:
+    return all(getattr(first, name) == getattr(second, name)
+               for name in ["version", "timestamp", "folders", "files", "fingerprints", "directories", "playlists"])
+
+
+def timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(trackCounts: list) -> None:
+    print(f"{'tracks':>10} {'file size':>12} {'legacy':>10} {'bulk':>10} {'speedup':>8}  identical")
+    for trackCount in trackCounts:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "Library.lib")
+            writeSynthetic(path, trackCount)
+            legacyTime, legacy = timed(legacyReadV1, path)
+            bulkTime, bulk = timed(libraryfile.readV1, path)
+            print(f"{trackCount:>10} {os.path.getsize(path):>12} {legacyTime:>9.2f}s {bulkTime:>9.2f}s "
+                  f"{legacyTime / bulkTime:>7.1f}x  {sameData(legacy, bulk)}")
+
+
+if __name__ == "__main__":
+    main([int(argument) for argument in sys.argv[1:]] or [100_000, 1_000_000])
@@ -0,0 +1,69 @@
+import os
+
+
+class FolderTrie:
+    """The library folders as a trie of path components, so that a folder inside another
+    folder of the library is recognized in a number of steps given by its depth.
+    Only the top-most folders (roots) have to be scanned, the nested ones are covered by them."""
+
+    FOLDER = None  # key marking a node that is a library folder itself
+
+    def __init__(self, folders: list = ()) -> None:
+        self._root = {}
+        for folder in folders:
+            self.add(folder)
+
+    @staticmethod
+    def _parts(folder: str) -> list:
+        return [part for part in os.path.normpath(folder).split(os.sep) if part]
+
+    def add(self, folder: str) -> None:
+        node = self._root
+        for part in self._parts(folder):
+            node = node.setdefault(part, {})
+        node[self.FOLDER] = folder
+
+    def remove(self, folder: str) -> None:
+        nodes = [self._root]
+        parts = self._parts(folder)
+        for part in parts:
+            if part not in nodes[-1]:
+                return
+            nodes.append(nodes[-1][part])
+        nodes[-1].pop(self.FOLDER, None)
+        for part, parent, node in zip(reversed(parts), reversed(nodes[:-1]), reversed(nodes[1:])):
+            if node:
+                break
+            del parent[part]
+
+    def covering(self, path: str) -> [str, None]:
+        """Returns the top-most folder that contains path or is path itself, None if there is none."""
+        node = self._root
+        if self.FOLDER in node:
+            return node[self.FOLDER]
+        for part in self._parts(path):
+            node = node.get(part)
+            if node is None:
+                return None
+            if self.FOLDER in node:
+                return node[self.FOLDER]
+        return None
+
+    def roots(self, under: str = None) -> list:
+        """Returns the top-most folders, only those inside the folder under if given (excluding under itself)."""
+        node = self._root
+        if under is not None:
+            for part in self._parts(under):
+                node = node.get(part)
+                if node is None:
+                    return []
+            node = {part: child for part, child in node.items() if part is not self.FOLDER}
+        roots = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if self.FOLDER in node:
+                roots.append(node[self.FOLDER])
+                continue
+            stack.extend(node.values())
+        return roots
@@ -1,4 +1,4 @@
 from musicplayer.gui.misc import *
 from musicplayer.gui.bottom import *
-from musicplayer.gui.mainArea import *
+from musicplayer.gui.mainarea import *
 from musicplayer.gui.window import *
@@ -1,10 +1,9 @@
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont, QPixmap, QResizeEvent
-from PyQt5.QtWidgets import (QFrame, QWidget, QHBoxLayout, QLabel, QPushButton,
-                             QVBoxLayout, QStackedWidget, QLayout, QSizePolicy,
-                             QGridLayout)
+from PyQt5.QtWidgets import (QFrame, QWidget, QHBoxLayout, QPushButton,
+                             QVBoxLayout, QStackedWidget)
 
-from musicplayer.gui import Line, FlowLayout, MediaWidget, SongWidget, clearLayout, MainScrollArea
+from musicplayer.gui import Line, MediaView, SongListView, NowPlayingView
 
 ARTIST, ALBUM, YEAR, NAME, TRACK, DISC, LENGTH = range(7)
 
@@ -59,47 +58,26 @@ class MainArea(QWidget):
         self.mainArea = QStackedWidget()
         self.layout.addWidget(self.mainArea)
 
-        self.artistScrollArea = MainScrollArea(FlowLayout)
-        self.artistLayout = self.artistScrollArea.widget().layout()
-        self.mainArea.insertWidget(0, self.artistScrollArea)
-
-        self.albumScrollArea = MainScrollArea(FlowLayout)
-        self.albumLayout = self.albumScrollArea.widget().layout()
-        self.mainArea.insertWidget(1, self.albumScrollArea)
-
-        self.playlistScrollArea = MainScrollArea(FlowLayout)
-        self.playlistLayout = self.playlistScrollArea.widget().layout()
-        self.mainArea.insertWidget(2, self.playlistScrollArea)
-
-        self.nowPlayingScrollArea = MainScrollArea(QGridLayout)
-        self.nowPlayingLayout = self.nowPlayingScrollArea.widget().layout()
-        self.nowPlayingLayout.setAlignment(Qt.AlignTop)
-        self.nowPlayingLayout.setHorizontalSpacing(0)
-        self.nowPlayingLayout.setVerticalSpacing(0)
-        self.nowPlayingLayout.setContentsMargins(0, 0, 0, 0)
-        self.nowPlayingLayout.setColumnStretch(0, 1)
-        self.nowPlayingLayout.setColumnStretch(1, 1)
-        self.nowPlayingLayout.setColumnStretch(3, 2)
-        self.mainArea.insertWidget(3, self.nowPlayingScrollArea)
+        self.artistView = MediaView(self.control, "artist", artistPixmap)
+        self.mainArea.insertWidget(0, self.artistView)
 
-        self.nowPlayingSong = None
-        self.garbageProtector = {}
+        self.albumView = MediaView(self.control, "album", albumPixmap)
+        self.mainArea.insertWidget(1, self.albumView)
+
+        self.playlistView = MediaView(self.control, "playlist", playlistPixmap)
+        self.mainArea.insertWidget(2, self.playlistView)
 
-        self.pixmaps = {"artist": artistPixmap,
-                        "album": albumPixmap,
-                        "playlist": playlistPixmap}
+        self.nowPlayingView = NowPlayingView(self.control)
+        self.nowPlayingModel = self.nowPlayingView.model()
+        self.mainArea.insertWidget(3, self.nowPlayingView)
+
+        self.nowPlayingSong = None  # row of the playing song
 
         self.activePixmaps = []
         self.index = 0
         for n in range(1, 8):
-            self.activePixmaps.append(QPixmap(f"{location}active{n}.png"))
-
-        for scrollArea in [self.artistScrollArea, self.albumScrollArea,
-                           self.playlistScrollArea, self.nowPlayingScrollArea]:
-            scrollArea.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-            scrollArea.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-            scrollArea.setWidgetResizable(True)
-            scrollArea.setFrameShape(QFrame.NoFrame)
+            self.activePixmaps.append(QPixmap(f"{location}active{n}.png").scaled(15, 15, Qt.IgnoreAspectRatio,
+                                                                                Qt.SmoothTransformation))
 
     def setButtons(self) -> None:
         """Creates buttons for switching between tabs."""
@@ -133,134 +111,40 @@ class MainArea(QWidget):
         self.setMainAreaPlaylists(library)
         self.setNowPlayingArea(library)
 
-    def updateView(self, library) -> None:
-        areas = {self.artistLayout: library.artists,
-                 self.albumLayout: library.albums,
-                 self.playlistLayout: library.playlists}
-        types = {self.artistLayout: "artist",
-                 self.albumLayout: "album",
-                 self.playlistLayout: "playlist"}
-        for area in areas:
-            fieldNames = []
-            toBeRemoved = []
-            for field in area.items:
-                fieldNames.append(field.widget().name)
-                if field.widget().name not in areas[area]:
-                    toBeRemoved.append(field)
-            if len(toBeRemoved):
-                for field in toBeRemoved:
-                    area.removeItem(field)
-                    field.widget().hide()
-                    field.widget().deleteLater()
-            for libraryItem in areas[area]:
-                if libraryItem not in fieldNames:
-                    self.addItemToLayout(area, types[area], libraryItem)
-                    fieldNames.append(libraryItem)
-
-    def addItemToLayout(self, layout: QLayout, isType: str, name: str) -> None:
-        item = MediaWidget(self.control, isType, name)
-        item.setFixedSize(160, 195)
-        itemLayout = QVBoxLayout()
-        item.setLayout(itemLayout)
-        label = QLabel()
-        label.setFixedSize(150, 150)
-        label.setPixmap(QPixmap(self.pixmaps[isType]))
-        label.setScaledContents(True)
-        itemLayout.addWidget(label)
-        label = QLabel(name)
-        label.setFixedWidth(150)
-        label.setStyleSheet("color:#afafaf;"
-                            "font-size: 12px;"
-                            "font-weight: bold;")
-        label.setAlignment(Qt.AlignCenter)
-        label.setWordWrap(True)
-        itemLayout.addWidget(label)
-        layout.addWidget(item)
+    def updateView(self, library, batch=None) -> None:
+        """Adds new artists/albums/playlists to the grids and removes those no longer in the library.
+        A batch of scan results that has no songs in it changes no names and is skipped."""
+        if batch is not None and not batch.added and not batch.changed and not batch.removed:
+            return
+        self.artistView.model().updateNames(library.artists)
+        self.albumView.model().updateNames(library.albums)
+        self.playlistView.model().updateNames(library.playlists)
 
     def setMainAreaArtists(self, library) -> None:
-        clearLayout(self.artistLayout)
-        if library is not None:
-            for artist in library.artists:
-                self.addItemToLayout(self.artistLayout, "artist", artist)
+        self.artistView.model().setNames(library.artists if library is not None else [])
 
     def setMainAreaAlbums(self, library) -> None:
-        clearLayout(self.albumLayout)
-        if library is not None:
-            for album in library.albums:
-                self.addItemToLayout(self.albumLayout, "album", album)
+        self.albumView.model().setNames(library.albums if library is not None else [])
 
     def setMainAreaPlaylists(self, library) -> None:
-        clearLayout(self.playlistLayout)
-        if library is not None:
-            for playlist in library.playlists:
-                self.addItemToLayout(self.playlistLayout, "playlist", playlist)
-
-    def setNowPlayingArea(self, library, clearOnly: bool = False) -> None:
-        clearLayout(self.nowPlayingLayout)
-        self.garbageProtector = {}
+        self.playlistView.model().setNames(library.playlists if library is not None else [])
+
+    def setNowPlayingArea(self, library) -> None:
+        """Shows the songs of the playlist, later changes of the playlist update their rows only."""
         self.nowPlayingSong = None
-        if library is not None:
-            column = 0
-            row = 0
-            for fieldName in ["Artist", "Album",
-                              "Track", "Title", "", "Length"]:
-                field = QLabel(fieldName)
-                field.setStyleSheet("QWidget {"
-                                    "    color:#afafaf;"
-                                    "    font-size: 15px;"
-                                    "    font-weight: bold;"
-                                    "    border-style: none none solid none;"
-                                    "    border-width: 2px;"
-                                    "    border-color: #afafaf;"
-                                    "}")
-                self.nowPlayingLayout.addWidget(field, row, column)
-                column += 1
-            row += 1
-            if clearOnly:
-                return
-            for n in range(self.control.playlist.mediaCount()):
-                media = self.control.playlist.media(n)
-                song = media.request().url().toLocalFile().replace("/", "\\")
-                if song in library.library:
-                    column = 0
-                    self.garbageProtector[song] = []
-                    for field in [ARTIST, ALBUM, TRACK, NAME, "pixmap",  LENGTH]:
-                        songWidget = SongWidget(self.control, song, True)
-                        songWidget.setLayout(QHBoxLayout())
-                        songWidget.setStyleSheet("QLabel {"
-                                                 "    color:#afafaf;"
-                                                 "    font-size: 12px;"
-                                                 "    border-style: none none solid none;"
-                                                 "    border-width: 0.5px;"
-                                                 "    border-color: #3c3c3c;"
-                                                 "}")
-                        label = QLabel()
-                        if field != "pixmap":
-                            label.setText(library.library[song][field])
-                            if field == LENGTH:
-                                label.setAlignment(Qt.AlignRight)
-                        else:
-                            label.setFixedSize(15, 15)
-                            label.setScaledContents(True)
-                        songWidget.layout().addWidget(label)
-                        songWidget.layout().setContentsMargins(0, 15, 0, 0)
-                        self.garbageProtector[song].append(label)
-                        self.nowPlayingLayout.addWidget(songWidget, row, column)
-                        column += 1
-                    row += 1
+        self.nowPlayingModel.reset(library.library if library is not None else {})
 
     def updateActiveSong(self, currentIndex: int) -> None:
         """Shows a small image on the currently playing song for visual feedback."""
-        if self.nowPlayingSong is not None:
-            self.nowPlayingSong.clear()
-            self.nowPlayingSong = None
-        if (item := self.nowPlayingLayout.itemAtPosition(currentIndex + 1, 4)) is not None:
-            label = item.widget().layout().itemAt(0).widget()
-            self.nowPlayingSong = label
+        self.clearActiveSong()
+        self.nowPlayingSong = currentIndex if 0 <= currentIndex < self.nowPlayingModel.rowCount() else None
+
+    def clearActiveSong(self) -> None:
+        self.nowPlayingModel.setActive(None, None)
 
     def activeSongPixmap(self) -> None:
         if self.nowPlayingSong is not None:
-            self.nowPlayingSong.setPixmap(self.activePixmaps[self.index])
+            self.nowPlayingModel.setActive(self.nowPlayingSong, self.activePixmaps[self.index])
             if self.index < 6:
                 self.index += 1
             else:
@@ -305,15 +189,10 @@ class SongList(QWidget):
         self.buttons.layout().addWidget(self.buttonOrderReverse)
         self.layout.addWidget(self.buttons)
 
-        self.scrollArea = MainScrollArea(QVBoxLayout)
-        self.scrollArea.setWidgetResizable(True)
-        self.scrollArea.setFrameShape(QFrame.NoFrame)
-        self.layout.addWidget(self.scrollArea)
-        self.songLayout = self.scrollArea.widget().layout()
-        self.songLayout.setSpacing(0)
-        self.songLayout.setAlignment(Qt.AlignTop)
-        self.garbageProtector = {}  # Necessary for preventing C++ from deleting the objects
-        self.nowPlayingSong = None
+        self.songView = SongListView(self.control)
+        self.songModel = self.songView.model()
+        self.layout.addWidget(self.songView)
+        self.nowPlayingSong = None  # row of the playing song
         self.displayedType = None
         self.activePixmaps = []
         self.index = 0
@@ -358,68 +237,33 @@ class SongList(QWidget):
         self.control.getSongs(None, None)
 
     def updateSongList(self, songList: list, library, currentSong: str, isPlaylist: str, isType: str) -> None:
-        """Clear and recreate the contents when user changes selection."""
+        """Replaces the contents when user changes selection, rows are only drawn once scrolled to."""
         # TODO add context menus for album titles
-        style = ("color:#afafaf;"
-                 "font-size: 13px;")
         self.displayedType = isType
-        currentAlbum = None
-        nowPlayingIncluded = False
-        clearLayout(self.songLayout)
-        self.garbageProtector = {}
-        for song in songList:
-            albumName = f"{library[song][ALBUM]} ({library[song][YEAR]})"
-            if albumName != currentAlbum:
-                albumLabel = QLabel(albumName)
-                albumLabel.setWordWrap(True)
-                albumLabel.setStyleSheet(style + "font-weight: bold;font-size: 18px;")
-                self.songLayout.addWidget(albumLabel)
-                currentAlbum = f"{library[song][ALBUM]} ({library[song][YEAR]})"
-            songName = QLabel(f"{library[song][TRACK]} - {library[song][NAME]}")
-            songName.setAlignment(Qt.AlignLeft)
-            songName.setStyleSheet(style)
-            songName.setWordWrap(True)
-            songLength = QLabel(library[song][LENGTH])
-            songLength.setAlignment(Qt.AlignRight)
-            songLength.setStyleSheet(style)
-            songLength.setFixedWidth(33)
-            songLabel = SongWidget(self.control, song, playlist=isPlaylist)
-            songLabel.setSizePolicy(QSizePolicy(QSizePolicy.Expanding,
-                                                QSizePolicy.Maximum,
-                                                QSizePolicy.Label))
-            songLabel.setStyleSheet("background-color:#141414;"
-                                    "color:#afafaf;"
-                                    "border-style: none;")
-            playIcon = QLabel()
-            playIcon.setFixedSize(10, 10)
-            playIcon.setScaledContents(True)
-            playIcon.setAlignment(Qt.AlignRight)
-            if song == currentSong and self.control.player.state() > 0:
-                self.nowPlayingSong = playIcon
-                nowPlayingIncluded = True
-            buttonLayout = QHBoxLayout()
-            songLabel.setLayout(buttonLayout)
-
-            buttonLayout.addWidget(songName)
-            buttonLayout.addWidget(playIcon)
-            buttonLayout.addWidget(songLength)
-            self.garbageProtector[song] = playIcon
-            self.songLayout.addWidget(songLabel)
-        if not nowPlayingIncluded:
-            self.nowPlayingSong = None
+        self.songView.playlist = isPlaylist
+        self.songModel.setSongs(songList, library)
+        self.nowPlayingSong = None
+        if currentSong in self.songModel.songRows and self.control.player.state() > 0:
+            self.nowPlayingSong = self.songModel.songRows[currentSong]
+        self.songView.scrollToTop()
         self.validateSortingButtonText()
 
+    @property
+    def songs(self) -> dict:
+        """The songs shown, in their order, mapped to their rows."""
+        return self.songModel.songRows
+
     def updateActiveSong(self, currentSong: str) -> None:
         """Shows a small image on the currently playing song for visual feedback."""
-        if self.nowPlayingSong is not None:
-            self.nowPlayingSong.clear()
-            self.nowPlayingSong = None
-        if currentSong in self.garbageProtector:
-            self.nowPlayingSong = self.garbageProtector[currentSong]
+        self.clearActiveSong()
+        self.nowPlayingSong = self.songModel.songRows.get(currentSong)
+
+    def clearActiveSong(self) -> None:
+        self.songModel.setActive(None, None)
 
     def activeSongPixmap(self) -> None:
         if self.nowPlayingSong is not None:
-            self.nowPlayingSong.setPixmap(self.activePixmaps[self.index])
+            self.songModel.setActive(self.nowPlayingSong, self.activePixmaps[self.index])
             if self.index < 6:
                 self.index += 1
             else:
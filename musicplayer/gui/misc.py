@@ -1,10 +1,16 @@
-from typing import Type
-from PyQt5.QtCore import QSize, Qt, QPoint, QRect, pyqtSignal, QEvent
-from PyQt5.QtGui import (QMouseEvent, QContextMenuEvent, QKeyEvent)
+import os
+from typing import Any
+from PyQt5.QtCore import (QSize, Qt, QPoint, QRect, pyqtSignal, QEvent, QAbstractListModel, QAbstractTableModel,
+                          QModelIndex, QMimeData)
+from PyQt5.QtGui import (QMouseEvent, QContextMenuEvent, QKeyEvent, QPixmap, QPainter, QColor, QFont,
+                         QFontMetrics, QDrag, QDropEvent, QDragLeaveEvent)
 from PyQt5.QtWidgets import (QFrame, QWidget, QLabel, QMainWindow,
-                             QMenu, QVBoxLayout, QLayout, QSizePolicy,
-                             QDialog, QLayoutItem, QLineEdit, QScrollArea,
-                             QScrollBar, QSlider)
+                             QMenu, QVBoxLayout,
+                             QDialog, QLineEdit,
+                             QScrollBar, QSlider, QListView, QAbstractItemView,
+                             QStyledItemDelegate, QStyleOptionViewItem, QTableView, QHeaderView)
+
+ARTIST, ALBUM, YEAR, NAME, TRACK, DISC, LENGTH = range(7)
 
 scrollBarStyle = ("QScrollBar:vertical {"
                   "    background-color: #141414;"
@@ -67,31 +73,117 @@ menuStyle = ("QMenu {"
              "}")
 
 
-class MediaWidget(QWidget):
-    """A class with click and double-click events implemented to ensure proper reactions.
+class MediaModel(QAbstractListModel):
+    """The names of the artists, albums or playlists shown in a MediaView."""
+
+    RESET_THRESHOLD = 64  # more changed names than this reset the model instead of signalling every row
+
+    def __init__(self, parent: QWidget = None) -> None:
+        super().__init__(parent)
+        self.names = []
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.names)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if role in (Qt.DisplayRole, Qt.ToolTipRole) and index.isValid():
+            return self.names[index.row()]
+        return None
+
+    def setNames(self, names: list) -> None:
+        self.beginResetModel()
+        self.names = list(names)
+        self.endResetModel()
+
+    def updateNames(self, names: list) -> None:
+        """Brings the model to the given names, a few changes are signalled row by row so that
+        the view keeps its scroll position. Names present in both keep their relative order."""
+        target = set(names)
+        current = set(self.names)
+        removed = current - target
+        added = target - current
+        if len(removed) + len(added) > self.RESET_THRESHOLD:
+            self.setNames(names)
+            return
+        for row in reversed([row for row, name in enumerate(self.names) if name in removed]):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.names[row]
+            self.endRemoveRows()
+        for row, name in enumerate(names):
+            if name in added:
+                self.beginInsertRows(QModelIndex(), row, row)
+                self.names.insert(row, name)
+                self.endInsertRows()
+
+
+class MediaDelegate(QStyledItemDelegate):
+    """Paints an artist, album or playlist tile: the image of its type with the name under it.
+    The image is scaled once and shared by all tiles."""
+
+    SIZE = QSize(160, 195)
+
+    def __init__(self, pixmap: str, parent: QWidget = None) -> None:
+        super().__init__(parent)
+        self.pixmap = QPixmap(pixmap).scaled(150, 150, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        self.font = QFont()
+        self.font.setPixelSize(12)
+        self.font.setBold(True)
+        self.color = QColor("#afafaf")
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        rect = option.rect
+        painter.save()
+        painter.drawPixmap(rect.x() + 5, rect.y() + 5, self.pixmap)
+        painter.setFont(self.font)
+        painter.setPen(self.color)
+        painter.drawText(QRect(rect.x() + 5, rect.y() + 160, 150, 35),
+                         Qt.AlignHCenter | Qt.AlignTop | Qt.TextWordWrap, index.data())
+        painter.restore()
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        return self.SIZE
+
+
+class MediaView(QListView):
+    """A grid of artists, albums or playlists, only the visible tiles are painted.
     Click displays songs for the particular artist, album, or playlist,
     double click puts these to the QMediaPlaylist and starts playback."""
 
-    click = pyqtSignal(str, str)
-    doubleClick = pyqtSignal()
-
-    def __init__(self, control, isType: str, name: str) -> None:
+    def __init__(self, control, isType: str, pixmap: str) -> None:
         super().__init__()
         self.control = control
-        self.name = name
-        self.click.connect(self.control.getSongs)
         self.type = isType
-        self.doubleClick.connect(self.control.playSongList)
+        self.name = None  # the name the context menu was opened for
+        self.setModel(MediaModel(self))
+        self.setItemDelegate(MediaDelegate(pixmap, self))
+        self.setViewMode(QListView.IconMode)
+        self.setMovement(QListView.Static)
+        self.setResizeMode(QListView.Adjust)
+        self.setUniformItemSizes(True)
+        self.setSpacing(3)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.setVerticalScrollBar(QScrollBar())
+        self.setStyleSheet(scrollBarStyle)
+        self.setFrameShape(QFrame.NoFrame)
 
     def mousePressEvent(self, event: QMouseEvent) -> None:
-        if event.button() == Qt.LeftButton:
-            self.click.emit(self.type, self.name)
+        index = self.indexAt(event.pos())
+        if event.button() == Qt.LeftButton and index.isValid():
+            self.control.getSongs(self.type, index.data())
 
     def mouseDoubleClickEvent(self, event: QMouseEvent) -> None:
-        if event.button() == Qt.LeftButton:
-            self.doubleClick.emit()
+        if event.button() == Qt.LeftButton and self.indexAt(event.pos()).isValid():
+            self.control.playSongList()
 
     def contextMenuEvent(self, event: QContextMenuEvent) -> None:
+        index = self.indexAt(event.pos())
+        if not index.isValid():
+            return
+        self.name = index.data()
         menu = QMenu()
         menu.setStyleSheet(menuStyle)
         menu.addAction("Play", self.play)
@@ -142,30 +234,12 @@ class MediaWidget(QWidget):
         self.control.deletePlaylist(self.name)
 
 
-class SongWidget(QWidget):
-    """A class representing a song in the Now Playing/right-hand side panel.
-    Allows for double-clicking in either area to jump playback to the particular song.
-    Argument isNowPlaying is used to determine the placement of the widget,
-    isPlaylist is used to determine whether the widget represents a song in a playlist."""
-
-    doubleClick = pyqtSignal(str)
-
-    def __init__(self, control, song: str, isNowPlaying: bool = False, playlist: str = None) -> None:
-        super().__init__()
-        self.control = control
-        self.song = song
-        self.isNowPlaying = isNowPlaying
-        self.playlist = playlist
-        if isNowPlaying:
-            self.doubleClick.connect(self.control.playFromNowPlaying)
-        else:
-            self.doubleClick.connect(self.control.playSongList)
-
-    def mouseDoubleClickEvent(self, event: QMouseEvent) -> None:
-        if event.button() == Qt.LeftButton:
-            self.doubleClick.emit(self.song)
+class SongMenu:
+    """The context menu of a song, used by the views showing songs. The class using it provides
+    control, song (the song the menu is shown for), isNowPlaying, row (its row in Now Playing)
+    and playlist (the playlist the song is shown from, None if it is not)."""
 
-    def contextMenuEvent(self, event: QContextMenuEvent) -> None:
+    def showSongMenu(self, position: QPoint) -> None:
         menu = QMenu()
         menu.setStyleSheet(menuStyle)
         if not self.isNowPlaying:
@@ -186,7 +260,7 @@ class SongWidget(QWidget):
         else:
             menu.addSeparator()
             menu.addAction("Remove from the playlist", self.removeFromPlaylist)
-        menu.move(event.globalX(), event.globalY())
+        menu.move(position)
         menu.exec()
 
     def play(self) -> None:
@@ -196,7 +270,7 @@ class SongWidget(QWidget):
         self.control.playSongWidget(self.song)
 
     def removeFromNowPlaying(self) -> None:
-        self.control.removeFromNowPlaying(self)
+        self.control.removeFromNowPlaying(self.row)
 
     def addAfterCurrent(self) -> None:
         self.control.playSongWidget(self.song, True)
@@ -217,17 +291,379 @@ class SongWidget(QWidget):
         self.control.removeFromPlaylist(self.playlist, self.song)
 
 
-class MainScrollArea(QScrollArea):
-    """A QScrollArea subclass that serves as a template for each of the scroll areas.
-    Specifically artist, album, playlist and now playing areas, and the right-hand side panel.
-    Requires a QLayout sub-class that will be instantiated and provide the layout."""
+class SongListModel(QAbstractListModel):
+    """The songs shown in the right-hand side panel, each album starts with a header row.
+    Texts are formatted from the library only for the rows that are drawn."""
 
-    def __init__(self, layoutType: Type[QLayout]) -> None:
+    HeaderRole = Qt.UserRole
+    SongRole = Qt.UserRole + 1
+    LengthRole = Qt.UserRole + 2
+
+    def __init__(self, parent: QWidget = None) -> None:
+        super().__init__(parent)
+        self.library = {}
+        self.rows = []  # song paths, None for the album headers
+        self.headers = {}  # row -> "album (year)"
+        self.songRows = {}  # song path -> row, in the order of the songs
+        self.activeRow = None
+        self.activePixmap = None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        row = index.row()
+        song = self.rows[row]
+        if role == self.HeaderRole:
+            return song is None
+        if song is None:
+            return self.headers[row] if role in (Qt.DisplayRole, Qt.ToolTipRole) else None
+        if role == self.SongRole:
+            return song
+        if role == Qt.DecorationRole:
+            return self.activePixmap if row == self.activeRow else None
+        if (entry := self.library.get(song)) is None:
+            return None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return f"{entry[TRACK]} - {entry[NAME]}"
+        if role == self.LengthRole:
+            return entry[LENGTH]
+        return None
+
+    def setSongs(self, songList: list, library: dict) -> None:
+        self.beginResetModel()
+        self.library = library
+        self.rows = []
+        self.headers = {}
+        self.songRows = {}
+        self.activeRow = None
+        currentAlbum = None
+        for song in songList:
+            entry = library[song]
+            albumName = f"{entry[ALBUM]} ({entry[YEAR]})"
+            if albumName != currentAlbum:
+                self.headers[len(self.rows)] = albumName
+                self.rows.append(None)
+                currentAlbum = albumName
+            self.songRows[song] = len(self.rows)
+            self.rows.append(song)
+        self.endResetModel()
+
+    def setActive(self, row: [int, None], pixmap: [QPixmap, None]) -> None:
+        """Shows the pixmap on the row of the playing song, only the rows changed are redrawn."""
+        previous, self.activeRow, self.activePixmap = self.activeRow, row, pixmap
+        for changed in {previous, row} - {None}:
+            index = self.index(changed)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class SongListDelegate(QStyledItemDelegate):
+    """Paints the rows of the SongListView, texts that do not fit are elided (full text in the tooltip)
+    so that all rows of a kind have the same height."""
+
+    SONG_HEIGHT = 30
+    HEADER_HEIGHT = 34
+    ICON_SIZE = 10
+
+    def __init__(self, parent: QWidget = None) -> None:
+        super().__init__(parent)
+        self.songFont = QFont()
+        self.songFont.setPixelSize(13)
+        self.headerFont = QFont(self.songFont)
+        self.headerFont.setPixelSize(18)
+        self.headerFont.setBold(True)
+        self.color = QColor("#afafaf")
+        self.lengthWidth = QFontMetrics(self.songFont).horizontalAdvance("00:00") + 2
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        rect = option.rect.adjusted(5, 0, -5, 0)
+        painter.save()
+        painter.setPen(self.color)
+        if index.data(SongListModel.HeaderRole):
+            painter.setFont(self.headerFont)
+            text = QFontMetrics(self.headerFont).elidedText(index.data(), Qt.ElideRight, rect.width())
+            painter.drawText(rect, Qt.AlignLeft | Qt.AlignBottom, text)
+        else:
+            painter.setFont(self.songFont)
+            lengthRect = QRect(rect.right() - self.lengthWidth, rect.y(), self.lengthWidth, rect.height())
+            iconRect = QRect(lengthRect.x() - self.ICON_SIZE - 6, rect.center().y() - self.ICON_SIZE // 2,
+                             self.ICON_SIZE, self.ICON_SIZE)
+            textRect = QRect(rect.x(), rect.y(), iconRect.x() - 6 - rect.x(), rect.height())
+            text = QFontMetrics(self.songFont).elidedText(index.data() or "", Qt.ElideRight, textRect.width())
+            painter.drawText(textRect, Qt.AlignLeft | Qt.AlignVCenter, text)
+            if (pixmap := index.data(Qt.DecorationRole)) is not None:
+                painter.drawPixmap(iconRect, pixmap)
+            painter.drawText(lengthRect, Qt.AlignRight | Qt.AlignVCenter, index.data(SongListModel.LengthRole) or "")
+        painter.restore()
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        return QSize(option.rect.width(),
+                     self.HEADER_HEIGHT if index.data(SongListModel.HeaderRole) else self.SONG_HEIGHT)
+
+
+class SongListView(QListView, SongMenu):
+    """The songs for the selected artist/album/playlist in the right-hand side panel,
+    the rows are laid out in batches and only the visible ones are painted.
+    Double-clicking a song plays the songs shown starting with it."""
+
+    isNowPlaying = False
+
+    def __init__(self, control) -> None:
         super().__init__()
-        self.setWidget(QWidget())
-        self.widget().setLayout(layoutType())
+        self.control = control
+        self.song = None  # the song the context menu was opened for
+        self.playlist = None
+        self.setModel(SongListModel(self))
+        self.setItemDelegate(SongListDelegate(self))
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(100)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setVerticalScrollBar(QScrollBar())
         self.setStyleSheet(scrollBarStyle)
+        self.setFrameShape(QFrame.NoFrame)
+
+    def mouseDoubleClickEvent(self, event: QMouseEvent) -> None:
+        song = self.indexAt(event.pos()).data(SongListModel.SongRole)
+        if event.button() == Qt.LeftButton and song is not None:
+            self.control.playSongList(song)
+
+    def contextMenuEvent(self, event: QContextMenuEvent) -> None:
+        self.song = self.indexAt(event.pos()).data(SongListModel.SongRole)
+        if self.song is not None:
+            self.showSongMenu(event.globalPos())
+
+
+class NowPlayingModel(QAbstractTableModel):
+    """The songs queued in the QMediaPlaylist, read from the PlayQueue of Control. The model follows
+    the signals of the playlist, so adding, removing or moving songs changes only their rows."""
+
+    HEADERS = ["Artist", "Album", "Track", "Title", "", "Length"]
+    FIELDS = [ARTIST, ALBUM, TRACK, NAME, None, LENGTH]
+    ICON_COLUMN = 4
+    MIME_TYPE = "application/x-musicplayer-now-playing-row"
+
+    def __init__(self, queue, parent: QWidget = None) -> None:
+        super().__init__(parent)
+        self.queue = queue
+        self.playlist = queue.playlist
+        self.library = {}
+        self.activeRow = None
+        self.activePixmap = None
+        self.moving = False  # a move is announced as such, not as the removal and insertion the playlist reports
+        self.playlist.mediaAboutToBeInserted.connect(self.mediaAboutToBeInserted)
+        self.playlist.mediaInserted.connect(self.mediaInserted)
+        self.playlist.mediaAboutToBeRemoved.connect(self.mediaAboutToBeRemoved)
+        self.playlist.mediaRemoved.connect(self.mediaRemoved)
+        self.playlist.mediaChanged.connect(self.mediaChanged)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.queue)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.DecorationRole:
+            return self.activePixmap if row == self.activeRow and column == self.ICON_COLUMN else None
+        if role == Qt.TextAlignmentRole and self.FIELDS[column] == LENGTH:
+            return Qt.AlignRight | Qt.AlignVCenter
+        if role != Qt.DisplayRole or (field := self.FIELDS[column]) is None:
+            return None
+        song = self.queue[row]
+        if (entry := self.library.get(song)) is None:
+            return os.path.basename(song) if field == NAME else ""
+        return entry[field]
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self) -> Qt.DropActions:
+        return Qt.MoveAction
+
+    def mimeTypes(self) -> list:
+        return [self.MIME_TYPE]
+
+    def mimeData(self, indexes: list) -> QMimeData:
+        data = QMimeData()
+        data.setData(self.MIME_TYPE, str(indexes[0].row()).encode())
+        return data
+
+    def reset(self, library: dict) -> None:
+        """Shows the songs of the queue with the entries of the library, used when the library is replaced."""
+        self.beginResetModel()
+        self.library = library
+        self.activeRow = None
+        self.endResetModel()
+
+    def mediaAboutToBeInserted(self, start: int, end: int) -> None:
+        if not self.moving:
+            self.beginInsertRows(QModelIndex(), start, end)
+
+    def mediaInserted(self, start: int, end: int) -> None:
+        if self.moving:
+            return
+        if self.activeRow is not None and self.activeRow >= start:
+            self.activeRow += end - start + 1
+        self.endInsertRows()
+
+    def mediaAboutToBeRemoved(self, start: int, end: int) -> None:
+        if not self.moving:
+            self.beginRemoveRows(QModelIndex(), start, end)
+
+    def mediaRemoved(self, start: int, end: int) -> None:
+        if self.moving:
+            return
+        if self.activeRow is not None and self.activeRow >= start:
+            self.activeRow = None if self.activeRow <= end else self.activeRow - (end - start + 1)
+        self.endRemoveRows()
+
+    def mediaChanged(self, start: int, end: int) -> None:
+        if self.moving:
+            return
+        self.dataChanged.emit(self.index(start, 0), self.index(end, len(self.HEADERS) - 1))
+
+    def moveMedia(self, source: int, target: int) -> bool:
+        """Moves the song at row source to row target in the playlist and in the model."""
+        if source == target or not 0 <= source < len(self.queue) or not 0 <= target < len(self.queue):
+            return False
+        self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), target + 1 if target > source else target)
+        self.moving = True
+        try:
+            moved = self.playlist.moveMedia(source, target)
+        finally:
+            self.moving = False
+        if moved:
+            if self.activeRow == source:
+                self.activeRow = target
+            elif self.activeRow is not None and min(source, target) <= self.activeRow <= max(source, target):
+                self.activeRow += 1 if source > target else -1
+        self.endMoveRows()
+        return moved
+
+    def setActive(self, row: [int, None], pixmap: [QPixmap, None]) -> None:
+        """Shows the pixmap on the row of the playing song, only the rows changed are redrawn."""
+        previous, self.activeRow, self.activePixmap = self.activeRow, row, pixmap
+        for changed in {previous, row} - {None}:
+            index = self.index(changed, self.ICON_COLUMN)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class NowPlayingView(QTableView, SongMenu):
+    """The Now Playing tab, only the visible rows are painted. Double-clicking a song jumps
+    playback to it, songs can be dragged to another position in the queue."""
+
+    isNowPlaying = True
+    playlist = None
+
+    def __init__(self, control) -> None:
+        super().__init__()
+        self.control = control
+        self.song = None  # the song and row the context menu was opened for
+        self.row = None
+        self.setModel(NowPlayingModel(control.queue, self))
+        header = self.horizontalHeader()
+        header.setSectionsClickable(False)
+        header.setHighlightSections(False)
+        header.setDefaultAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        header.setMinimumSectionSize(25)
+        for column in [0, 1, 3]:
+            header.setSectionResizeMode(column, QHeaderView.Stretch)
+        for column, width in [(2, 60), (4, 25), (5, 60)]:
+            header.setSectionResizeMode(column, QHeaderView.Fixed)
+            header.resizeSection(column, width)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(35)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setIconSize(QSize(15, 15))
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setDragEnabled(True)
+        self.setAcceptDrops(True)
+        self.setDropIndicatorShown(True)
+        self.setDragDropMode(QAbstractItemView.InternalMove)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollBar(QScrollBar())
+        self.setFrameShape(QFrame.NoFrame)
+        self.setStyleSheet(scrollBarStyle +
+                           "QTableView {"
+                           "    color:#afafaf;"
+                           "    font-size: 12px;"
+                           "    border-style: none;"
+                           "}"
+                           "QTableView::item {"
+                           "    border-style: none none solid none;"
+                           "    border-width: 0.5px;"
+                           "    border-color: #3c3c3c;"
+                           "}"
+                           "QTableView::item:selected {"
+                           "    background-color: #303030;"
+                           "    color:#afafaf;"
+                           "}"
+                           "QHeaderView::section {"
+                           "    background-color: #141414;"
+                           "    color:#afafaf;"
+                           "    font-size: 15px;"
+                           "    font-weight: bold;"
+                           "    border-style: none none solid none;"
+                           "    border-width: 2px;"
+                           "    border-color: #afafaf;"
+                           "}")
+
+    def mouseDoubleClickEvent(self, event: QMouseEvent) -> None:
+        index = self.indexAt(event.pos())
+        if event.button() == Qt.LeftButton and index.isValid():
+            self.control.playFromNowPlaying(index.row())
+
+    def contextMenuEvent(self, event: QContextMenuEvent) -> None:
+        index = self.indexAt(event.pos())
+        if index.isValid():
+            self.row = index.row()
+            self.song = self.model().queue[self.row]
+            self.showSongMenu(event.globalPos())
+
+    def startDrag(self, supportedActions: Qt.DropActions) -> None:
+        """The drop moves the song in the playlist, the rows are not removed once the drag ends
+        as QAbstractItemView does for moves."""
+        indexes = self.selectedIndexes()
+        if indexes:
+            drag = QDrag(self)
+            drag.setMimeData(self.model().mimeData(indexes))
+            drag.exec(Qt.MoveAction)
+
+    def dropEvent(self, event: QDropEvent) -> None:
+        """Moves the dragged song before the row it is dropped on, after it if dropped on its lower half."""
+        if event.source() is not self or not event.mimeData().hasFormat(NowPlayingModel.MIME_TYPE):
+            event.ignore()
+            return
+        source = int(bytes(event.mimeData().data(NowPlayingModel.MIME_TYPE)))
+        index = self.indexAt(event.pos())
+        if index.isValid():
+            target = index.row() + (event.pos().y() > self.visualRect(index).center().y())
+        else:
+            target = self.model().rowCount()
+        super().dragLeaveEvent(QDragLeaveEvent())  # stops the auto scroll and hides the drop indicator
+        event.accept()
+        self.control.moveInNowPlaying(source, target)
 
 
 class Line(QWidget):
@@ -272,92 +708,6 @@ class Line(QWidget):
             self.leftWidget.setFixedWidth(self.window.width() - self.rightWidget.preferredWidth - 15)
 
 
-class FlowLayout(QLayout):
-    """A Qt example class translated from C++ that is able to dynamically
-    adjust widget placement based on available space. Original accessible here:
-    https://doc.qt.io/qt-5/qtwidgets-layouts-flowlayout-example.html"""
-
-    def __init__(self, parent=None, margin: int = 0, spacing: int = -1) -> None:
-        super().__init__(parent)
-        self.parent = parent
-        self.margin = margin
-        if parent is not None:
-            self.setContentsMargins(margin, margin, margin, margin)
-        self.spacing = spacing
-        self.items = []
-
-    def addItem(self, item: QLayoutItem) -> None:
-        self.items.append(item)
-
-    def itemAt(self, index: int) -> QLayoutItem:
-        if index in range(0, len(self.items)):
-            return self.items[index]
-
-    def takeAt(self, index) -> QLayoutItem:
-        if index in range(0, len(self.items)):
-            return self.items.pop(index)
-
-    def expandingDirections(self) -> Qt.Orientations:
-        return Qt.Orientations(Qt.Orientation(0))
-
-    def hasHeightForWidth(self) -> bool:
-        return True
-
-    def heightForWidth(self, width: int) -> int:
-        height = self.doLayout(QRect(0, 0, width, 0), True)
-        return height
-
-    def sizeHint(self) -> QSize:
-        return self.minimumSize()
-
-    def minimumSize(self) -> QSize:
-        size = QSize()
-        for item in self.items:
-            size = size.expandedTo(item.minimumSize())
-
-        size += QSize(2 * self.margin, 2 * self.margin)
-        return size
-
-    def setGeometry(self, rect: QRect) -> None:
-        super().setGeometry(rect)
-        self.doLayout(rect, False)
-
-    def doLayout(self, rect: QRect, forTestOnly: bool) -> int:
-        x = rect.x()
-        y = rect.y()
-        lineHeight = 0
-        for item in self.items:
-            spaceX = self.spacing + item.widget().style().layoutSpacing(QSizePolicy.DefaultType,
-                                                                        QSizePolicy.DefaultType,
-                                                                        Qt.Horizontal)
-            spaceY = self.spacing + item.widget().style().layoutSpacing(QSizePolicy.DefaultType,
-                                                                        QSizePolicy.DefaultType,
-                                                                        Qt.Vertical)
-            nextX = x + item.sizeHint().width() + spaceX
-            if nextX - spaceX > rect.right() and lineHeight > 0:
-                x = rect.x()
-                y = y + lineHeight + spaceY
-                nextX = x + item.sizeHint().width() + spaceX
-                lineHeight = 0
-            if not forTestOnly:
-                item.setGeometry(QRect(QPoint(x, y), item.sizeHint()))
-            x = nextX
-            lineHeight = max(lineHeight, item.sizeHint().height())
-        return y + lineHeight - rect.y()
-
-    def count(self) -> int:
-        return len(self.items)
-
-
-def clearLayout(layout: QLayout) -> None:
-    """Used to remove widgets from various layouts"""
-    if layout.count():
-        while (item := layout.takeAt(0)) is not None:
-            layout.removeItem(item)
-            item.widget().hide()
-            item.widget().deleteLater()
-
-
 class ClickLabel(QLabel):
     """A class that implements the ability to accepts mouse clicks on a QLabel."""
 
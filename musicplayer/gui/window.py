@@ -1,3 +1,4 @@
+import os
 from typing import Any
 
 from PyQt5.QtCore import Qt, QPoint, QTimer, pyqtSignal
@@ -325,7 +326,7 @@ class FoldersDialog(QDialog):
 
     def updateFolders(self, folder: str) -> None:
         field = ClickLabel()
-        field.setText(folder.replace("/", "\\"))
+        field.setText(os.path.normpath(folder))
         field.setFixedHeight(15)
         field.click.connect(self.highlightLabel)
         self.foldersLayout.addWidget(field)
@@ -1,192 +1,938 @@
+import bisect
+import collections
 import datetime
-import gzip
+import gc
+import itertools
+import multiprocessing
+import operator
 import os
 import re
-import struct
-from typing import Any
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Iterable, Iterator
+from mutagen import MutagenError
 from mutagen.easyid3 import EasyID3
+from mutagen.id3 import ID3NoHeaderError
 from mutagen.mp3 import MP3
 
+from musicplayer import foldertrie, libraryfile, mp3info, tagcache
+
+
+def readTags(path: str) -> list:
+    """Reads tags and length of a single mp3 file and normalizes the track number,
+    date and title. Defined on module level so that it can be run in worker processes.
+    The file is read by mp3info, mutagen is only used for the files it does not support.
+    Returns None if the file can't be read (it is not an mp3 file or it was removed)."""
+    return _readTags(path)[0]
+
+
+def _readTags(path: str) -> tuple:
+    """Returns the values read by readTags and the number of bytes read from the file,
+    the size of the file for the files read by mutagen."""
+    keyList = ["artist", "album", "date", "title", "tracknumber", "discnumber"]
+    try:
+        try:
+            info = mp3info.MP3Info(path)
+            song, length, bytesRead = info.tags, info.length, info.bytesRead
+        except mp3info.UnsupportedFile:
+            try:
+                song = EasyID3(path)
+            except ID3NoHeaderError:
+                song = {}  # a file without tags, its title is the file name
+            length, bytesRead = MP3(path).info.length, os.path.getsize(path)
+    except (OSError, MutagenError) as error:
+        print(f"file skipped: {path}: {error}")
+        return None, 0
+    valueList = []
+    for key in keyList:
+        try:
+            if song[key]:
+                value = song[key][0]
+            else:
+                value = "Unknown"
+        except KeyError:
+            value = "Unknown"
+        if key == "tracknumber":
+            if not re.fullmatch(r"\d\d", value):
+                if match := re.match(r"\d\d?", value):
+                    if match2 := re.fullmatch(r"\d", match.group(0)):
+                        value = f"{match2.group(0):0>2}"
+                    else:
+                        value = match.group(0)
+        elif key == "date":
+            if not re.fullmatch(r"\d{4}", value):
+                if match := re.match(r"\d{4}", value):
+                    value = match.group(0)
+        elif key == "title" and value == "Unknown":
+            value = os.path.basename(path)
+        valueList.append(value)
+    length = round(length)
+    length = f"{length // 60 :02}:{length % 60 :02}"
+    return [*valueList, length], bytesRead
+
+
+def _poolContext() -> multiprocessing.context.BaseContext:
+    """Processes reading tags are started by a fork server where there is one, spawned otherwise."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _readChunk(paths: list) -> list:
+    """Reads tags of several files in a worker process."""
+    return [_readTags(path) for path in paths]
+
+
+def _number(text: str) -> int:
+    """Returns the number a year, track or disc number starts with ("1/12" -> 1), 0 if there is none."""
+    match = re.match(r"\d+", text)
+    return int(match.group(0)) if match else 0
+
+
+def _formatNumber(number: int, width: int) -> str:
+    return f"{number:0{width}}" if number else "Unknown"
+
+
+def _duration(length: str) -> int:
+    """Converts a "mm:ss" length to milliseconds."""
+    minutes, _, seconds = length.partition(":")
+    try:
+        return (int(minutes) * 60 + int(seconds)) * 1000
+    except ValueError:
+        return 0
+
+
+def _formatDuration(duration: int) -> str:
+    length = round(duration / 1000)
+    return f"{length // 60 :02}:{length % 60 :02}"
+
+
+def _parser(parse: Any, format: Any) -> Any:
+    """Returns a function converting a display string to (value, True if the value is formatted back
+    to the same string). The results are remembered, as these tags take only a few distinct values."""
+    cache = {}
+
+    def parseText(text: str) -> tuple:
+        try:
+            return cache[text]
+        except KeyError:
+            value = parse(text)
+            result = cache[text] = (value, format(value) == text)
+            return result
+    return parseText
+
+
+_parseYear = _parser(_number, lambda number: _formatNumber(number, 1))
+_parseTrack = _parser(_number, lambda number: _formatNumber(number, 2))
+_parseDisc = _parser(_number, lambda number: _formatNumber(number, 1))
+_parseLength = _parser(_duration, _formatDuration)
+
+
+class Song:
+    """A single song entry of the library. Values are accessed by the Library.ARTIST..LENGTH
+    indices the same way as the lists of tags returned by readTags, apart from the title
+    all strings are interned, so that a name shared by many songs is stored only once.
+    Year, track and disc number are kept as integers (0 if unknown) and the length as duration
+    in milliseconds, their display strings are only formatted when they are indexed. Values that
+    would not be formatted back the same way (e.g. "1/2" as disc number) are kept as text as well.
+    Attributes artistKey and albumKey are the casefolded names used for sorting."""
+
+    __slots__ = ("artist", "album", "title", "year", "track", "disc", "duration", "artistKey", "albumKey", "text")
+
+    def __init__(self, values: list) -> None:
+        intern = sys.intern
+        self.artist = intern(values[0])
+        self.album = intern(values[1])
+        self.title = values[3]
+        self.artistKey = intern(self.artist.casefold())
+        self.albumKey = intern(self.album.casefold())
+        self.year, year = _parseYear(values[2])
+        self.track, track = _parseTrack(values[4])
+        self.disc, disc = _parseDisc(values[5])
+        self.duration, length = _parseLength(values[6])
+        if year and track and disc and length:
+            self.text = None
+        else:
+            self.text = (intern(values[2]), intern(values[4]), intern(values[5]), intern(values[6]))
+
+    def __getitem__(self, index: [int, slice]) -> [str, tuple]:
+        if isinstance(index, slice):
+            return tuple(self[n] for n in range(7)[index])
+        return _FIELDS[index](self)
+
+    def _formatYear(self) -> str:
+        return self.text[0] if self.text else _formatNumber(self.year, 1)
+
+    def _formatTrack(self) -> str:
+        return self.text[1] if self.text else _formatNumber(self.track, 2)
+
+    def _formatDisc(self) -> str:
+        return self.text[2] if self.text else _formatNumber(self.disc, 1)
+
+    def _formatLength(self) -> str:
+        return self.text[3] if self.text else _formatDuration(self.duration)
+
+    def __len__(self) -> int:
+        return 7
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self[:])
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (Song, list, tuple)):
+            return self[:] == tuple(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Song({list(self)!r})"
+
+
+_FIELDS = (operator.attrgetter("artist"), operator.attrgetter("album"), Song._formatYear,
+           operator.attrgetter("title"), Song._formatTrack, Song._formatDisc, Song._formatLength)
+
+
+class ScanProgress:
+    """Progress of a scan, read by the thread that started it. Counts directories listed
+    or skipped as unchanged, files found to be read, files parsed (read or taken from the tag cache)
+    and bytes read from them. Method cancel stops the scan after the file or directory at hand,
+    no more batches are yielded then and the songs not reached by the scan stay in the library."""
+
+    def __init__(self) -> None:
+        self.directories = 0
+        self.found = 0
+        self.parsed = 0
+        self.bytesRead = 0
+        self.started = time.monotonic()
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def eta(self) -> [float, None]:
+        """Seconds left until the files found so far are parsed, at the rate they were parsed so far.
+        Files in directories not listed yet are not accounted for, None until a file is parsed."""
+        if not self.parsed:
+            return None
+        return (self.found - self.parsed) * self.elapsed / self.parsed
+
+
+class RateLimiter:
+    """Paces reading of files during a scan to at most filesPerSecond files and bytesPerSecond bytes
+    per second, None meaning no limit. While a song is played from the same device as the files being read
+    (playbackDevice, see Library.setPlayback), the playback limits apply instead, so that the scan
+    does not starve the player of the disk or the network link."""
+
+    BURST = 1.0  # seconds of unused rate that may be caught up with
+
+    def __init__(self, filesPerSecond: float = None, bytesPerSecond: float = None,
+                 playbackFilesPerSecond: float = 50, playbackBytesPerSecond: float = 1_000_000) -> None:
+        self.filesPerSecond = filesPerSecond
+        self.bytesPerSecond = bytesPerSecond
+        self.playbackFilesPerSecond = playbackFilesPerSecond
+        self.playbackBytesPerSecond = playbackBytesPerSecond
+        self.playbackDevice = None
+        self.reset()
+
+    def reset(self) -> None:
+        self._started = time.monotonic()
+        self._files = 0
+        self._bytes = 0
+        self._limits = None
+
+    def delay(self, files: int, bytesRead: int, device: int = None) -> float:
+        """Accounts for files and bytes read from device, returns the number of seconds
+        to wait before reading more to stay within the limits."""
+        if device is not None and device == self.playbackDevice:
+            limits = (self.playbackFilesPerSecond, self.playbackBytesPerSecond)
+        else:
+            limits = (self.filesPerSecond, self.bytesPerSecond)
+        if limits != self._limits:
+            self.reset()  # what was read under other limits does not count
+            self._limits = limits
+        self._files += files
+        self._bytes += bytesRead
+        due = max(self._files / limits[0] if limits[0] else 0.0, self._bytes / limits[1] if limits[1] else 0.0)
+        delay = self._started + due - time.monotonic()
+        if delay < -self.BURST:
+            self._started -= delay + self.BURST
+        return max(0.0, delay)
+
+
+class ScanBatch:
+    """Changes found by a single step of the library scan. Attributes added and changed
+    map song paths to their new values (the song record of a song moved within the library),
+    removed maps song paths to their last known values (None for files whose tags could not be read),
+    fingerprints maps song paths to their new (size, mtime in ns, inode) fingerprints."""
+
+    def __init__(self, added: dict = None, changed: dict = None, removed: dict = None,
+                 directories: dict = None, fingerprints: dict = None) -> None:
+        self.added = added if added is not None else {}
+        self.changed = changed if changed is not None else {}
+        self.removed = removed if removed is not None else {}
+        self.directories = directories
+        self.fingerprints = fingerprints if fingerprints is not None else {}
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed or self.fingerprints
+                    or self.directories is not None)
+
 
 class Library:
     """Provides access to music collection,
     as well as returning lists of songs that fit the given criteria.
-    The typical song entry is {songPath: [artist, album, year, title, track number, genre, length]}"""
+    The typical song entry is {songPath: Song([artist, album, year, title, track number, disc number, length])}
+    Changes are saved by a background thread, playlist changes are appended to a journal next to the library file."""
 
     ARTIST, ALBUM, YEAR, NAME, TRACK, DISC, LENGTH = range(7)
 
-    MAGIC = b"\x01\xff"
-    TIME_FORMAT = "%Y%m%d%H%M%S"
+    POOL_THRESHOLD = 64
+    READ_CHUNK = 32  # files handed to a worker process at once
+    UNKNOWN = sys.maxsize  # sort key of unknown years, track and disc numbers
+    VIEW_CACHE_SIZE = 32
+    JOURNAL_LIMIT = 1000  # journal records after which the library is saved and the journal emptied
 
-    def __init__(self) -> None:
+    def __init__(self, workers: int = None, batchSize: int = 500, scan: bool = True,
+                 strict: bool = False, saveInterval: float = 5.0, libraryFile: str = r"musicplayer\Library.lib") -> None:
+        """Argument workers is the number of processes used for reading tags,
+        defaults to the number of CPUs, 1 reads all tags in this process.
+        If scan is False, only the saved library is loaded and the caller is
+        responsible for running update or scan.
+        Songs are considered existing as long as the last scan found them, if strict
+        is True, the songs returned by getSongsFor* are checked on the disk as well.
+        Argument saveInterval is the least number of seconds between two saves of the library file,
+        libraryFile is its path, the playlist journal and the tag cache are kept next to it."""
         self._folders = []
+        self._folderTrie = foldertrie.FolderTrie()
         self._files = {}
-        self.libraryFile = r"musicplayer\Library.lib"
+        self.libraryFile = libraryFile
         self.timestamp = datetime.datetime.min
         self._playlists = {}
         self.tempFiles = set()
         self.changed = False
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.batchSize = batchSize
+        self._pending = []
+        self._cachedTags = {}
+        self._tagKeys = {}
+        self.tagCache = tagcache.TagCache()
+        self._tagCacheLoaded = False
+        self._directories = {}
+        self._scannedDirectories = {}
+        self._dirFiles = {}
+        self._fingerprints = {}
+        self._songsByFingerprint = {}
+        self._devices = {}  # st_dev of the scanned library folders, the tag cache keys of removed songs need it
+        self._newFingerprints = {}
+        self._artistIndex = {}
+        self._albumIndex = {}
+        self._artistNames = {}
+        self._albumNames = {}
+        self._sortedArtists = []
+        self._sortedAlbums = []
+        self.fullScan = False
+        self.strict = strict
+        self.compressLibrary = True  # an uncompressed library file is memory-mapped when loaded
+        self.listingThreads = 8  # directories listed at once, hides the latency of network drives
+        self.progress = ScanProgress()
+        self.rateLimiter = RateLimiter()
+        self.saveInterval = saveInterval
+        self._lock = threading.RLock()  # guards the saved data against mutations while a snapshot is taken
+        self._writeLock = threading.Lock()
+        self._saveTimer = None
+        self._lastSave = 0.0
+        self._journalSequence = 0
+        self._journalLength = 0
+        self.generation = 0
+        self._views = collections.OrderedDict()
+        self._viewsGeneration = 0
         self._load()
-        self.update()
+        if scan:
+            self.update()
 
-    def update(self) -> None:
+    def update(self, full: bool = False, progress: ScanProgress = None) -> None:
         """Go through files in the library folders looking for:
         a) files that were changed after the library was last updated,
-        b) files that were removed after the library was last loaded."""
-        for folder in self._folders:
-            self._getFiles(folder)
-        temp = [file for file in self._files]
-        for file in temp:
-            if file not in self.tempFiles:
-                del self._files[file]
-                self.changed = True
-        for playlist in self._playlists:
-            for song in self._playlists[playlist]:
-                if song not in self.tempFiles:
-                    self._playlists[playlist].remove(song)
-                    self.changed = True
+        b) files that were removed after the library was last loaded.
+        Blocks until the whole scan is finished and saved, see scan for the incremental version."""
+        for batch in self.scan(full, progress):
+            self.applyBatch(batch)
+        self.finishScan()
+        self.flush()
+
+    def scan(self, full: bool = False, progress: ScanProgress = None) -> Iterator[ScanBatch]:
+        """Goes through the library folders and yields the found changes in batches
+        without modifying the library itself, so it can be run outside the GUI thread.
+        The batches have to be passed to applyBatch in the order they were yielded.
+        Unless full is True, directories whose modification time did not change are not
+        listed and the files in them are not checked for changes in place.
+        The progress of the scan is counted in progress (a new one if not given), also kept
+        in the progress attribute. A cancelled scan does not report any songs as removed."""
+        self._startScan(progress)
+        self.fullScan = full
+        self._scannedDirectories = {}
+        roots = self._roots()
+        for root in roots:
+            try:
+                self._devices[root] = os.stat(root).st_dev
+            except OSError:
+                pass
+        traversal = self._traverse(roots)
+        try:
+            for songs in self._readPending(traversal):
+                yield self._batchFromSongs(songs)
+        finally:
+            traversal.close()
+        if self.progress.cancelled:
+            self.tempFiles.clear()
+            self._scannedDirectories = {}
+            self._newFingerprints = {}
+            return
+        removed = {path: self._files.get(path) for path in self._knownFiles() if path not in self.tempFiles}
         self.tempFiles.clear()
+        directories = self._scannedDirectories if self._scannedDirectories != self._directories else None
+        self._scannedDirectories = {}
+        fingerprints, self._newFingerprints = self._newFingerprints, {}
+        if removed or directories is not None or fingerprints:
+            yield ScanBatch(removed=removed, directories=directories, fingerprints=fingerprints)
+
+    def scanPaths(self, changed: Iterable[str], removed: Iterable[str],
+                  progress: ScanProgress = None) -> Iterator[ScanBatch]:
+        """Yields the changes for the given paths only, used when the changes are known
+        from watching the library folders. Changed directories are read as a whole,
+        a removed directory removes all songs under it."""
+        self._startScan(progress)
+        for path in changed:
+            if os.path.isdir(path):
+                for directory, _, files in os.walk(path):
+                    for file in files:
+                        if file.lower().endswith(".mp3"):
+                            self._addPending(os.path.join(directory, file))
+            elif path.lower().endswith(".mp3") and os.path.isfile(path):
+                self._addPending(path)
+        for songs in self._readPending():
+            yield self._batchFromSongs(songs)
+        if self.progress.cancelled:
+            self._newFingerprints = {}
+            return
+        removedSongs = {}
+        for path in removed:
+            if path in self._files or path in self._fingerprints:
+                removedSongs[path] = self._files.get(path)
+            else:
+                prefix = os.path.join(path, "")
+                removedSongs.update({file: self._files.get(file) for file in self._knownFiles()
+                                     if file.startswith(prefix)})
+        if removedSongs:
+            yield ScanBatch(removed=removedSongs)
+
+    def _startScan(self, progress: [ScanProgress, None]) -> None:
+        """Prepares a scan, in the scanning thread. The first one builds what only the scan
+        needs and loads the tag cache, which are left out of loading the library to start up faster.
+        The tag cache only keeps files that are not in the library, the songs of the library are found
+        by their fingerprint when they show up at another path."""
+        self.progress = progress if progress is not None else ScanProgress()
+        self.rateLimiter.reset()
+        self.tempFiles.clear()  # left over if the previous scan failed
+        self._newFingerprints = {}
+        with self._lock:
+            if self._dirFiles is None:
+                self._dirFiles = {}
+                for path in self._knownFiles():
+                    self._dirFiles.setdefault(os.path.dirname(path), set()).add(path)
+            if self._songsByFingerprint is None:
+                self._songsByFingerprint = {fingerprint: path for path, fingerprint in self._fingerprints.items()
+                                            if path in self._files}
+        if not self._tagCacheLoaded:
+            self._tagCacheLoaded = True
+            self.tagCache.load(self.tagCacheFile, list(self._fingerprints.values()))
+
+    def setPlayback(self, path: [str, None]) -> None:
+        """Tells the scan which file is being played, None if nothing is, reading of files
+        from the same device is slowed down to the playback limits of rateLimiter."""
+        try:
+            self.rateLimiter.playbackDevice = os.stat(path).st_dev if path else None
+        except OSError:
+            self.rateLimiter.playbackDevice = None
+
+    def _throttle(self, path: str, files: int, bytesRead: int) -> None:
+        """Waits as long as rateLimiter requires after reading from the device of path."""
+        delay = self.rateLimiter.delay(files, bytesRead, self._tagKeys[path][0])
+        while delay > 0 and not self.progress.cancelled:
+            time.sleep(min(delay, 0.1))
+            delay -= 0.1
+
+    def _addPending(self, path: str, stat: os.stat_result = None) -> None:
+        """Marks a file for reading its tags along with the fingerprint it will be stored with,
+        a file found in the tag cache, or moved within the library, is not read."""
+        try:
+            if stat is None:
+                stat = os.stat(path)
+            key = self.tagCache.key(path, stat)
+        except OSError:
+            return
+        self.progress.found += 1
+        fingerprint = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        values = self.tagCache.get(key)
+        if values is None and stat.st_ino:
+            values = self._files.get(self._songsByFingerprint.get(fingerprint))
+        if values is not None:
+            self._cachedTags[path] = values
+        else:
+            self._pending.append(path)
+            self._tagKeys[path] = key
+        self._newFingerprints[path] = fingerprint
+
+    def _batchFromSongs(self, songs: dict) -> ScanBatch:
+        batch = ScanBatch()
+        for path in songs:
+            if path in self._newFingerprints:
+                batch.fingerprints[path] = self._newFingerprints.pop(path)
+        for path, values in songs.items():
+            if path in self._files:
+                batch.changed[path] = values
+            else:
+                batch.added[path] = values
+        return batch
+
+    def applyBatch(self, batch: ScanBatch) -> None:
+        """Merges a batch of changes found by scan into the library."""
+        with self._lock:
+            for path, values in batch.changed.items():
+                if path in self._files:
+                    self._unindexSong(path, self._files[path])
+                self._files[path] = song = values if isinstance(values, Song) else Song(values)
+                self._indexSong(path, song)
+            for path, values in batch.added.items():
+                self._files[path] = song = values if isinstance(values, Song) else Song(values)
+                self._indexSong(path, song)
+            if self._songsByFingerprint is not None:
+                for path, fingerprint in batch.fingerprints.items():
+                    if self._songsByFingerprint.get(self._fingerprints.get(path)) == path:
+                        del self._songsByFingerprint[self._fingerprints[path]]
+                    if path in self._files:
+                        self._songsByFingerprint[fingerprint] = path
+            self._fingerprints.update(batch.fingerprints)
+            for path in batch.removed:
+                song = self._files.pop(path, None)
+                fingerprint = self._fingerprints.pop(path, None)
+                if song is not None:
+                    self._unindexSong(path, song)
+                if fingerprint is not None:
+                    if self._songsByFingerprint is not None and self._songsByFingerprint.get(fingerprint) == path:
+                        del self._songsByFingerprint[fingerprint]
+                    if song is not None:
+                        self._cacheRemoved(path, song, fingerprint)
+            if self._dirFiles is not None:
+                for path in itertools.chain(batch.added, batch.fingerprints):
+                    self._dirFiles.setdefault(os.path.dirname(path), set()).add(path)
+                for path in batch.removed:
+                    self._dirFiles.get(os.path.dirname(path), set()).discard(path)
+            if batch.directories is not None:
+                self._directories = batch.directories
+            if batch.removed:
+                for playlist in self._playlists:
+                    self._playlists[playlist] = [song for song in self._playlists[playlist]
+                                                 if song not in batch.removed]
+            if batch.added or batch.changed or batch.removed:
+                self.generation += 1
+            if batch:
+                self.changed = True
+
+    def _cacheRemoved(self, path: str, song: Song, fingerprint: tuple) -> None:
+        """Keeps the tags of a song that left the library in the tag cache, in case the file is added back."""
+        for root, device in self._devices.items():
+            if path.startswith(os.path.join(root, "")):
+                size, mtime, inode = fingerprint
+                self.tagCache.put((device, inode, size, mtime), song)
+                return
+
+    def finishScan(self) -> None:
+        """Schedules saving the library if any of the applied batches changed it."""
         if self.changed:
-            self._save()
             self.timestamp = datetime.datetime.now()
-            self.changed = False
+            self.markChanged()
 
     def _load(self) -> bool:
-        """Loads data form a binary gzip file on program startup.
+        """Loads data form the library file on program startup.
         The file contains all data from the library as at the
-        last time the library was loaded."""
+        last time the library was loaded. Files in the old format are
+        converted to the current one on the next save."""
         print("Loading data from library file...")
+        collecting = gc.isenabled()
+        gc.disable()  # none of the objects created here is garbage, collections would only slow the start-up
         try:
-            with gzip.open(self.libraryFile, "rb") as fh:
-                if not fh.read(2) == self.MAGIC:
-                    return False
-                temp = {}
-                folderCount = fh.read(2)
-                folderCount = struct.unpack("<h", folderCount)[0]
-                timestamp = fh.read(14)
-                timestamp = struct.unpack("<14s", timestamp)[0].decode()
-                for n in range(folderCount):
-                    length = fh.read(2)
-                    length = struct.unpack("<h", length)[0]
-                    folder = fh.read(struct.Struct(f"<{length}s").size)
-                    folder = struct.unpack(f"<{length}s", folder)[0].decode("utf8")
-                    self._folders.append(folder)
-                if not fh.read(2) == self.MAGIC:
-                    return False
-                while True:
-                    length = fh.read(2)
-                    if length == self.MAGIC:
-                        break
-                    length = struct.unpack("<h", length)[0]
-                    path = fh.read(struct.Struct(f"<{length}s").size)
-                    path = struct.unpack(f"<{length}s", path)[0].decode("utf8")
-                    attributes = []
-                    for n in range(7):
-                        length = fh.read(2)
-                        length = struct.unpack("<h", length)[0]
-                        attrib = fh.read(struct.Struct(f"<{length}s").size)
-                        attrib = struct.unpack(f"<{length}s", attrib)[0].decode("utf8")
-                        attributes.append(attrib)
-                    temp[path] = attributes
-                    if not fh.read(2) == self.MAGIC:
-                        print("file corrupted...")
-                        return False
-                length = fh.read(2)
-                length = struct.unpack("<h", length)[0]
-                if length > 0:
-                    for _ in range(length):
-                        length = fh.read(2)
-                        length = struct.unpack("<h", length)[0]
-                        playlist = fh.read(struct.Struct(f"<{length}s").size)
-                        playlist = struct.unpack(f"<{length}s", playlist)[0].decode("utf8")
-                        self._playlists[playlist] = []
-                        while True:
-                            length = fh.read(2)
-                            if length == self.MAGIC:
-                                break
-                            length = struct.unpack("<h", length)[0]
-                            song = fh.read(struct.Struct(f"<{length}s").size)
-                            song = struct.unpack(f"<{length}s", song)[0].decode("utf8")
-                            if os.path.exists(song):
-                                self._playlists[playlist].append(song)
-            self._files = temp
-            self.timestamp = datetime.datetime.strptime(timestamp, Library.TIME_FORMAT)
+            try:
+                data = libraryfile.read(self.libraryFile)
+            except (OSError, ValueError) as error:
+                print(f"library file not loaded: {error}")
+                self._replayJournal(0)
+                return False
+            self._folders = data.folders
+            self._folderTrie = foldertrie.FolderTrie(self._folders)
+            self._files = dict(zip(data.files, map(Song, data.files.values())))
+            self._fingerprints = data.fingerprints
+            self._directories = data.directories
+            self._playlists = data.playlists
+            self._replayJournal(data.journalSequence)
+            self._indexAll()
+            self._dirFiles = None  # only needed by the scan, built when the first one starts
+            self._songsByFingerprint = None
+            self.timestamp = data.timestamp
+            if data.version < libraryfile.VERSION:
+                self.changed = True
+            # the loaded songs live as long as the program, later collections do not have to go through them
+            gc.freeze()
             return True
-        except Exception:
-            return False
+        finally:
+            if collecting:
+                gc.enable()
+
+    def markChanged(self) -> None:
+        """Marks the library as changed and schedules saving it in a background thread,
+        changes made before the save starts are written together."""
+        with self._lock:
+            self.changed = True
+            if self._saveTimer is None:
+                delay = max(0.0, self._lastSave + self.saveInterval - time.monotonic())
+                self._saveTimer = threading.Timer(delay, self._scheduledSave)
+                self._saveTimer.daemon = True
+                self._saveTimer.start()
+
+    def _scheduledSave(self) -> None:
+        with self._lock:
+            self._saveTimer = None
+        self._save()
+
+    def flush(self) -> None:
+        """Saves the pending changes immediately, called on exit."""
+        with self._lock:
+            if self._saveTimer is not None:
+                self._saveTimer.cancel()
+                self._saveTimer = None
+        self._save()
 
     def _save(self) -> None:
-        """Saves current data to a binary gzip file that will be loaded
-        on the next start-up."""
-        print("Saving data to library file...")
-        with gzip.open(self.libraryFile, "wb") as fh:
-            fh.write(self.MAGIC)
-            fh.write(struct.pack("<h", len(self._folders)))
-            fh.write(struct.pack("<14s", datetime.datetime.now().strftime(Library.TIME_FORMAT).encode()))
-            for folder in self._folders:
-                toBeWritten = struct.pack(f"<h{len(folder.encode())}s", len(folder.encode()), folder.encode())
-                fh.write(toBeWritten)
-            fh.write(self.MAGIC)
-            for song in self._files:
-                toBeWritten = struct.pack(f"<h{len(song.encode())}s", len(song.encode()), song.encode())
-                fh.write(toBeWritten)
-                for attrib in self._files[song]:
-                    toBeWritten = struct.pack(f"<h{len(attrib.encode())}s", len(attrib.encode()), attrib.encode())
-                    fh.write(toBeWritten)
-                fh.write(self.MAGIC)
-            fh.write(self.MAGIC)
-            fh.write(struct.pack("<h", len(self._playlists)))
-            for playlist in self._playlists:
-                toBeWritten = struct.pack(f"<h{len(playlist.encode())}s", len(playlist.encode()), playlist.encode())
-                fh.write(toBeWritten)
-                for song in self._playlists[playlist]:
-                    toBeWritten = struct.pack(f"<h{len(song.encode())}s", len(song.encode()), song.encode())
-                    fh.write(toBeWritten)
-                fh.write(self.MAGIC)
-
-    def _getFiles(self, folder: [str, os.DirEntry]) -> None:
-        """A recursive function that loops through files in a the given folder
-        looking for files that have last-changed timestamp higher than the library
-        timestamp -> these were changed after the library was last loaded."""
-        keyList = ["artist", "album", "date", "title", "tracknumber", "discnumber"]
-        if not os.path.exists(folder):
+        """Saves current data to the library file that will be loaded
+        on the next start-up. The lock is only held while the data is copied,
+        the library can be changed again while the file is being written.
+        The tag cache is saved as well, even if the library itself did not change."""
+        with self._writeLock:
+            with self._lock:
+                data = None
+                if self.changed:
+                    data = libraryfile.LibraryData()
+                    data.timestamp = datetime.datetime.now()
+                    data.folders = list(self._folders)
+                    data.files = dict(self._files)
+                    data.fingerprints = dict(self._fingerprints)
+                    data.directories = dict(self._directories)
+                    data.playlists = {playlist: list(songs) for playlist, songs in self._playlists.items()}
+                    data.journalSequence = self._journalSequence
+                    self.changed = False
+                elif not self.tagCache.changed:
+                    return
+                fingerprints = list(data.fingerprints.values() if data is not None else self._fingerprints.values())
+            if data is not None:
+                print("Saving data to library file...")
+                self._lastSave = time.monotonic()
+                try:
+                    libraryfile.write(self.libraryFile, data, self.compressLibrary)
+                except OSError as error:
+                    print(f"library file not saved: {error}")
+                    self.markChanged()  # tried again after saveInterval
+                    return
+                self._compactJournal(data.journalSequence)
+            self.tagCache.save(self.tagCacheFile, fingerprints)
+
+    @property
+    def journalFile(self) -> str:
+        return f"{self.libraryFile}.journal"
+
+    @property
+    def tagCacheFile(self) -> str:
+        return f"{self.libraryFile}.tags"
+
+    def _replayJournal(self, sequence: int) -> None:
+        """Applies the journal records newer than the given sequence number,
+        i.e. the playlist changes made after the library file was last saved.
+        Songs that are no longer in the library are left out of the playlists."""
+        try:
+            records = libraryfile.readJournal(self.journalFile)
+        except OSError as error:
+            print(f"playlist journal not loaded: {error}")
+            records = []
+        self._journalSequence = sequence
+        for recordSequence, operation, args in records:
+            if recordSequence > self._journalSequence:
+                self._applyPlaylistChange(operation, args)
+                self._journalSequence = recordSequence
+        self._journalLength = len(records)
+        self._playlists = {playlist: [song for song in songs if song in self._files]
+                           for playlist, songs in self._playlists.items()}
+
+    def _compactJournal(self, sequence: int) -> None:
+        """Drops the journal records included in a library file saved with the given sequence number,
+        records appended while the file was being written are kept."""
+        with self._lock:
+            if not self._journalLength:
+                return
+            try:
+                records = []
+                if self._journalSequence != sequence:
+                    records = [record for record in libraryfile.readJournal(self.journalFile)
+                               if record[0] > sequence]
+                libraryfile.writeJournal(self.journalFile, records)
+                self._journalLength = len(records)
+            except OSError as error:
+                print(f"playlist journal not compacted: {error}")
+
+    def _changePlaylists(self, changes: list) -> None:
+        """Applies (operation, (arguments, ...)) playlist changes and appends them to the journal
+        in one write, the library file is only saved once the journal grows over JOURNAL_LIMIT records."""
+        if not changes:
             return
-        for dirEntry in os.scandir(folder):
-            if dirEntry.name.lower().endswith(".mp3"):
-                self.tempFiles.add(dirEntry.path)
-                stat = dirEntry.stat()
-                modified = datetime.datetime.fromtimestamp(stat.st_mtime)
-                if modified > self.timestamp or dirEntry.path not in self._files:
-                    song = EasyID3(dirEntry.path)
-                    value_list = []
-                    for key in keyList:
-                        try:
-                            if song[key]:
-                                value = song[key][0]
-                            else:
-                                value = "Unknown"
-                        except KeyError:
-                            value = "Unknown"
-                        if key == "tracknumber":
-                            if not re.fullmatch(r"\d\d", value):
-                                if match := re.match(r"\d\d?", value):
-                                    if match2 := re.fullmatch(r"\d", match.group(0)):
-                                        value = f"{match2.group(0):0>2}"
-                                    else:
-                                        value = match.group(0)
-                        elif key == "date":
-                            if not re.fullmatch(r"\d{4}", value):
-                                if match := re.match(r"\d{4}", value):
-                                    value = match.group(0)
-                        elif key == "title" and value == "Unknown":
-                            value = dirEntry.name
-                        value_list.append(value)
-                    length = round(MP3(dirEntry.path).info.length)
-                    length = f"{length // 60 :02}:{length % 60 :02}"
-                    self._files.update({dirEntry.path: [*value_list, length]})
-                    self.changed = True
-            elif dirEntry.is_dir():
-                self._getFiles(dirEntry)
+        with self._lock:
+            records = []
+            for operation, args in changes:
+                self._applyPlaylistChange(operation, args)
+                self._journalSequence += 1
+                records.append((self._journalSequence, operation, args))
+            try:
+                libraryfile.appendJournal(self.journalFile, records)
+            except OSError as error:
+                print(f"playlist journal not written: {error}")
+                self.markChanged()
+                return
+            self._journalLength += len(records)
+            if self._journalLength >= self.JOURNAL_LIMIT:
+                self.markChanged()
+
+    def _applyPlaylistChange(self, operation: int, args: tuple) -> None:
+        self.generation += 1
+        if operation == libraryfile.PLAYLIST_CREATED:
+            self._playlists[args[0]] = []
+        elif operation == libraryfile.PLAYLIST_DELETED:
+            self._playlists.pop(args[0], None)
+        elif operation == libraryfile.PLAYLIST_RENAMED:
+            if args[0] in self._playlists:
+                self._playlists[args[1]] = self._playlists.pop(args[0])
+        elif operation == libraryfile.SONG_ADDED:
+            self._playlists.setdefault(args[0], []).append(args[1])
+        elif operation == libraryfile.SONG_REMOVED:
+            if args[1] in self._playlists.get(args[0], ()):
+                self._playlists[args[0]].remove(args[1])
+
+    def _traverse(self, folders: list) -> Iterator[None]:
+        """Goes through the directory trees of the given folders looking for files whose size,
+        modification time or inode differ from the fingerprint stored in the library -> these were
+        changed after the library was last loaded, they are marked for reading with _addPending.
+        Directories are listed by a pool of listingThreads threads, with at most that many listings
+        in flight, so a slow drive answers several requests at a time. Yields after every listed
+        directory, so that the tags of the files found so far can be read meanwhile."""
+        with ThreadPoolExecutor(self.listingThreads) as pool:
+            waiting = list(folders)
+            running = set()
+            while (waiting or running) and not self.progress.cancelled:
+                while waiting and len(running) < self.listingThreads:
+                    running.add(pool.submit(self._listDirectory, waiting.pop()))
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    waiting.extend(self._addListing(future.result()))
+                    yield
+
+    def _listDirectory(self, path: str) -> tuple:
+        """Lists a single directory in a worker thread and returns (path, mtime, files, subdirectories),
+        files being a list of (path, stat) of the mp3 files in it. A directory with unchanged modification
+        time is not listed, None is returned for files then and subdirectories are the known ones.
+        A directory that no longer exists is returned with mtime None, one that can't be read (e.g. a network
+        drive that timed out) with mtime and files None. A file whose stat fails is returned with stat None."""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            return path, None, [], []
+        except OSError:
+            return path, None, None, []
+        known = self._directories.get(path)
+        if not self.fullScan and known is not None and known[0] == mtime:
+            return path, mtime, None, known[1]
+        files, subdirs = [], []
+        try:
+            for dirEntry in os.scandir(path):
+                isMp3 = dirEntry.name.lower().endswith(".mp3")
+                try:
+                    if isMp3:
+                        files.append((dirEntry.path, dirEntry.stat()))
+                    elif dirEntry.is_dir():
+                        subdirs.append(dirEntry.path)
+                except FileNotFoundError:
+                    continue  # removed while the directory was listed
+                except OSError:
+                    # a read error must not remove anything, the file is kept as it is
+                    # and a possible directory is listed on its own
+                    if isMp3:
+                        files.append((dirEntry.path, None))
+                    else:
+                        subdirs.append(dirEntry.path)
+        except (FileNotFoundError, NotADirectoryError):
+            return path, None, [], []
+        except OSError:
+            return path, None, None, []
+        return path, mtime, files, subdirs
+
+    def _addListing(self, listing: tuple) -> list:
+        """Compares the files of a directory listed by _listDirectory with the library,
+        returns the subdirectories to be listed next."""
+        path, mtime, files, subdirs = listing
+        if mtime is None:
+            if files is None:
+                self._keepUnreadable(path)
+            return []
+        self.progress.directories += 1
+        self._scannedDirectories[path] = (mtime, subdirs)
+        if files is None:
+            # the same key the song paths in this directory have, regardless of a trailing separator
+            self.tempFiles.update(list(self._dirFiles.get(os.path.dirname(os.path.join(path, "x")), ())))
+            return subdirs
+        for file, stat in files:
+            self.tempFiles.add(file)
+            if stat is None:
+                continue
+            fingerprint = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            known = self._fingerprints.get(file)
+            if known is None and file in self._files \
+                    and datetime.datetime.fromtimestamp(stat.st_mtime) <= self.timestamp:
+                # saved without a fingerprint by an older version, the library timestamp is trusted once
+                self._newFingerprints[file] = fingerprint
+            elif known != fingerprint:
+                self._addPending(file, stat)
+        return subdirs
+
+    def _keepUnreadable(self, path: str) -> None:
+        """Keeps the known songs and directories under a directory that could not be read,
+        they are only removed once the directory is found to no longer exist."""
+        prefix = os.path.join(path, "")
+        self.tempFiles.update([file for file in self._knownFiles() if file.startswith(prefix)])
+        self._scannedDirectories.update({directory: known for directory, known in list(self._directories.items())
+                                         if directory == path or directory.startswith(prefix)})
+
+    def _indexAll(self) -> None:
+        """Indexes all songs at once when the library is loaded, the names are sorted once."""
+        for index, names, key, name in [(self._artistIndex, self._artistNames, "artistKey", "artist"),
+                                        (self._albumIndex, self._albumNames, "albumKey", "album")]:
+            index.clear()
+            for path, value in zip(self._files, map(operator.attrgetter(key), self._files.values())):
+                songs = index.get(value)
+                if songs is None:
+                    index[value] = {path}
+                else:
+                    songs.add(path)
+            names.clear()
+            names.update(collections.Counter(map(operator.attrgetter(name), self._files.values())))
+        self._sortedArtists = sorted(self._artistNames)
+        self._sortedAlbums = sorted(self._albumNames)
+
+    def _indexSong(self, path: str, song: Song) -> None:
+        for index, names, sortedNames, name, key in [
+                (self._artistIndex, self._artistNames, self._sortedArtists, song.artist, song.artistKey),
+                (self._albumIndex, self._albumNames, self._sortedAlbums, song.album, song.albumKey)]:
+            index.setdefault(key, set()).add(path)
+            names[name] = names.get(name, 0) + 1
+            if names[name] == 1:
+                bisect.insort(sortedNames, name)
+
+    def _unindexSong(self, path: str, song: Song) -> None:
+        for index, names, sortedNames, name, key in [
+                (self._artistIndex, self._artistNames, self._sortedArtists, song.artist, song.artistKey),
+                (self._albumIndex, self._albumNames, self._sortedAlbums, song.album, song.albumKey)]:
+            songs = index.get(key)
+            if songs is not None:
+                songs.discard(path)
+                if not songs:
+                    del index[key]
+            if name in names:
+                names[name] -= 1
+                if names[name] == 0:
+                    del names[name]
+                    del sortedNames[bisect.bisect_left(sortedNames, name)]
+
+    def _readPending(self, discovering: Iterator[None] = iter(())) -> Iterator[dict]:
+        """Reads tags of the files marked by _addPending and yields them in batches of batchSize songs.
+        Files found in the tag cache or moved within the library come first.
+        Iterating discovering marks more files (the directory traversal of scan), the files found so far
+        are read in the meantime in this process. The pool of worker processes is only started once
+        the listing threads are done, if enough files are left, and its processes come from a fork server,
+        as forking this multithreaded process could deadlock them.
+        Reading is paced by rateLimiter and stops when the scan is cancelled."""
+        batch = {}
+        pool = None
+        reading = collections.deque()  # (paths, future) in the order the files were found
+        discovered = False
+        try:
+            while not self.progress.cancelled:
+                if not discovered:
+                    discovered = next(discovering, StopIteration) is StopIteration
+                self.progress.parsed += len(self._cachedTags)
+                batch.update(self._cachedTags)
+                self._cachedTags.clear()
+                if pool is None and discovered and self.workers > 1 and len(self._pending) >= self.POOL_THRESHOLD:
+                    pool = ProcessPoolExecutor(self.workers, mp_context=_poolContext())
+                if pool is not None:
+                    while self._pending and (len(self._pending) >= self.READ_CHUNK or discovered) \
+                            and len(reading) < self.workers * 2 and not self.progress.cancelled:
+                        paths = self._pending[:self.READ_CHUNK]
+                        del self._pending[:len(paths)]
+                        self._throttle(paths[0], len(paths), 0)
+                        reading.append((paths, pool.submit(_readChunk, paths)))
+                    blocking = discovered
+                    while reading and (blocking or reading[0][1].done()):
+                        blocking = False
+                        paths, future = reading.popleft()
+                        for path, (values, bytesRead) in zip(paths, future.result()):
+                            self._addRead(batch, path, values, bytesRead)
+                            self._throttle(path, 0, bytesRead)
+                        if len(batch) >= self.batchSize:
+                            break
+                else:
+                    # a chunk per listed directory while there are listing threads, the pool may read the rest
+                    count = self.READ_CHUNK if self.workers > 1 and not discovered else self.batchSize - len(batch)
+                    paths = self._pending[:count]
+                    del self._pending[:len(paths)]
+                    for path in paths:
+                        values, bytesRead = _readTags(path)
+                        self._addRead(batch, path, values, bytesRead)
+                        self._throttle(path, 1, bytesRead)
+                        if self.progress.cancelled:
+                            break
+                while len(batch) >= self.batchSize and not self.progress.cancelled:
+                    songs = dict(itertools.islice(batch.items(), self.batchSize))
+                    for path in songs:
+                        del batch[path]
+                    yield songs
+                if discovered and not reading and not self._pending and not self._cachedTags:
+                    break
+            if batch and not self.progress.cancelled:
+                yield batch
+        finally:
+            if pool is not None:
+                for _, future in reading:
+                    future.cancel()
+                pool.shutdown()
+            self._pending.clear()
+            self._cachedTags.clear()
+            self._tagKeys.clear()
+
+    def _addRead(self, batch: dict, path: str, values: [list, None], bytesRead: int) -> None:
+        """Adds the tags read to the batch, files that could not be read are left out."""
+        if values is not None:
+            batch[path] = values
+        self.progress.parsed += 1
+        self.progress.bytesRead += bytesRead
 
     @property
     def library(self) -> dict:
@@ -203,93 +949,166 @@ class Library:
         """Returns a list of all folders in the library."""
         return self._folders
 
+    @property
+    def directories(self) -> list:
+        """Returns a list of all directories found by the last scan."""
+        return list(self._directories)
+
     @property
     def artists(self) -> list:
-        """Returns a list of all artists in the library."""
-        return sorted(list(set(self._files[song][self.ARTIST] for song in self._files)))
+        """Returns a sorted list of all artists in the library."""
+        return list(self._sortedArtists)
 
     @property
     def albums(self) -> list:
-        """Returns a list of all albums in the library."""
-        return sorted(list(set(self._files[song][self.ALBUM] for song in self._files)))
+        """Returns a sorted list of all albums in the library."""
+        return list(self._sortedAlbums)
 
-    def addFolder(self, newFolder: str) -> None:
-        self._folders.append(newFolder)
-        self.update()
+    def _knownFiles(self) -> set:
+        """Returns the paths of the songs and of the files whose tags could not be read,
+        the latter only have a fingerprint, so that they are not read again until they change."""
+        return self._files.keys() | self._fingerprints.keys()
 
-    def deleteFolder(self, folder: str) -> None:
-        if folder in self._folders:
-            self._folders.remove(folder)
+    def _roots(self) -> list:
+        """Returns the library folders that are not inside another library folder, in the order they were added."""
+        with self._lock:
+            return [folder for folder in self._folders if self._folderTrie.covering(folder) == folder]
+
+    def addFolder(self, newFolder: str, update: bool = True) -> bool:
+        """Adds a folder to the library, returns False if the folder is already
+        covered by another library folder and there is nothing new to scan."""
+        with self._lock:
+            if newFolder in self._folders:
+                return False
+            covered = self._folderTrie.covering(newFolder) is not None
+            self._folders.append(newFolder)
+            self._folderTrie.add(newFolder)
+            self.changed = True  # saved after the scan, unless there is nothing to scan
+        if covered:
+            self.markChanged()
+            return False
+        if update:
             self.update()
+        return True
+
+    def deleteFolder(self, folder: str, update: bool = True) -> ScanBatch:
+        """Removes a folder from the library. The songs under it that are not covered by another
+        library folder are found by their path, without reading the disk, and returned as a batch
+        of removed songs, which is applied right away if update is True."""
+        with self._lock:
+            if folder not in self._folders:
+                return ScanBatch()
+            covered = self._folderTrie.covering(folder) != folder
+            self._folders.remove(folder)
+            self._folderTrie.remove(folder)
+            self.changed = True  # saved with the removed songs, unless there are none
+            if covered:
+                self.markChanged()
+                return ScanBatch()
+            prefixes = tuple(os.path.join(path, "") for path in [folder, *self._folderTrie.roots(folder)])
+
+            def removed(path: str) -> bool:
+                return (path == folder or path.startswith(prefixes[0])) \
+                    and not any(path == root[:-1] or path.startswith(root) for root in prefixes[1:])
+
+            batch = ScanBatch(removed={path: self._files.get(path) for path in self._knownFiles() if removed(path)},
+                              directories={directory: known for directory, known in self._directories.items()
+                                           if not removed(directory)})
+        if update:
+            self.applyBatch(batch)
+            self.finishScan()
+        return batch
 
     def createPlaylist(self, newPlaylist: str) -> None:
-        self._playlists[newPlaylist] = []
-        self.changed = True
+        self._changePlaylists([(libraryfile.PLAYLIST_CREATED, (newPlaylist,))])
 
     def deletePlaylist(self, playlist: str) -> None:
         if playlist in self._playlists:
-            del self._playlists[playlist]
-            self.changed = True
+            self._changePlaylists([(libraryfile.PLAYLIST_DELETED, (playlist,))])
 
     def renamePlaylist(self, playlist: str, newPlaylistName: str) -> None:
         if playlist in self._playlists:
-            self._playlists[newPlaylistName] = self._playlists[playlist]
-            del self._playlists[playlist]
-            self.changed = True
+            self._changePlaylists([(libraryfile.PLAYLIST_RENAMED, (playlist, newPlaylistName))])
 
-    def addToPlaylist(self, playlist: str, song: str) -> None:
-        if playlist not in self._playlists:
-            self._playlists[playlist] = []
-        self._playlists[playlist].append(song)
-        self.changed = True
+    def addToPlaylist(self, playlist: str, *songs: str) -> None:
+        self._changePlaylists([(libraryfile.SONG_ADDED, (playlist, song)) for song in songs])
 
     def deleteFromPlaylist(self, playlist: str, song: str) -> None:
         if playlist in self._playlists:
             if song in self._playlists[playlist]:
-                self._playlists[playlist].remove(song)
-                self.changed = True
+                self._changePlaylists([(libraryfile.SONG_REMOVED, (playlist, song))])
+
+    def _existing(self, songs: Iterable[str]) -> list:
+        """Returns the given songs as a list, without the ones missing on the disk in strict mode."""
+        if self.strict:
+            return [song for song in songs if os.path.exists(song)]
+        return list(songs)
+
+    def _view(self, view: tuple, songs: Any, key: Any = None, group: Any = None) -> list:
+        """Returns the song list for view = (type, name, orderBy, reverse). Argument songs returns
+        the unsorted song paths, key is a function of the song records they are sorted by.
+        If view is reversed, the order of groups of songs with the same group key is reversed,
+        songs in a group stay in ascending order, e.g. the albums of an artist ordered by year.
+        Without group the whole list is reversed. The lists are kept in a LRU cache until the
+        generation of the library changes, reversing a cached list needs no sorting.
+        Nothing is cached in strict mode, the songs have to be checked on the disk every time."""
+        if self.strict:
+            result = self._sorted(self._existing(songs()), key)
+            return self._reversed(result, group) if view[-1] else result
+        if self._viewsGeneration != self.generation:
+            self._views.clear()
+            self._viewsGeneration = self.generation
+        if view in self._views:
+            self._views.move_to_end(view)
+            return list(self._views[view])
+        opposite = self._views.get(view[:-1] + (not view[-1],))
+        if opposite is not None:
+            result = self._reversed(opposite, group)
+        else:
+            result = self._sorted(self._existing(songs()), key)
+            if view[-1]:
+                result = self._reversed(result, group)
+        self._views[view] = result
+        if len(self._views) > self.VIEW_CACHE_SIZE:
+            self._views.popitem(last=False)
+        return list(result)
+
+    def _sorted(self, songs: list, key: Any) -> list:
+        """Sorts song paths by a key function of their records in a single pass."""
+        if key is None:
+            return songs
+        files = self._files
+        return sorted(songs, key=lambda x: key(files[x]))
+
+    def _reversed(self, songs: list, group: Any) -> list:
+        if group is None:
+            return songs[::-1]
+        files = self._files
+        groups = [list(paths) for _, paths in itertools.groupby(songs, key=lambda x: group(files[x]))]
+        return [song for paths in reversed(groups) for song in paths]
 
     def getSongsForArtist(self, artist: str, orderBy: str = None, reverse: bool = False) -> list:
         """Returns a list of all song paths for a given artist with optional sorting new first."""
-        songs = []
-        for song in self._files:
-            if os.path.exists(song):
-                if self._files[song][self.ARTIST].lower() == artist.lower():
-                    songs.append(song)
-        songs.sort(key=lambda x: (self._files[x][self.ALBUM], self._files[x][self.DISC],
-                                  self._files[x][self.TRACK]))
+        artist = artist.casefold()
+        unknown = self.UNKNOWN
         if orderBy == "Year" or orderBy is None:
-            songs.sort(key=lambda x: self._files[x][self.YEAR], reverse=reverse)
-        elif orderBy == "Album":
-            songs.sort(key=lambda x: self._files[x][self.ALBUM], reverse=reverse)
-        return songs
+            return self._view(("artist", artist, "Year", reverse), lambda: self._artistIndex.get(artist, ()),
+                              lambda x: (x.year or unknown, x.albumKey, x.disc or unknown, x.track or unknown),
+                              lambda x: x.year)
+        return self._view(("artist", artist, orderBy, reverse and orderBy == "Album"),
+                          lambda: self._artistIndex.get(artist, ()),
+                          lambda x: (x.albumKey, x.disc or unknown, x.track or unknown), lambda x: x.albumKey)
 
     def getSongsForAlbum(self, album: str, ignored: Any = None, reverse: bool = False) -> list:
-        songs = []
-        for song in self._files:
-            if os.path.exists(song):
-                if self._files[song][self.ALBUM].lower() == album.lower():
-                    songs.append(song)
-        return sorted(songs, reverse=reverse)
+        album = album.casefold()
+        return self._view(("album", album, None, reverse), lambda: sorted(self._albumIndex.get(album, ())))
 
     def getSongsForPlaylist(self, playlist: str, orderBy: str = None, reverse: bool = False) -> list:
         if playlist not in self._playlists:
             return []
-        elif orderBy == "Year":
-            return sorted(self._playlists[playlist],
-                          key=lambda x: (self._files[x][self.YEAR],
-                                         self._files[x][self.ALBUM],
-                                         self._files[x][self.DISC]),
-                          reverse=reverse)
-        elif orderBy == "Album":
-            return sorted(self._playlists[playlist],
-                          key=lambda x: (self._files[x][self.ALBUM], self._files[x][self.DISC]),
-                          reverse=reverse)
-        elif orderBy == "Artist":
-            return sorted(self._playlists[playlist],
-                          key=lambda x: (self._files[x][self.ARTIST],
-                                         self._files[x][self.YEAR],
-                                         self._files[x][self.ALBUM],
-                                         self._files[x][self.DISC]),
-                          reverse=reverse)
-        return self._playlists[playlist]
+        unknown = self.UNKNOWN
+        keys = {"Year": lambda x: (x.year or unknown, x.albumKey, x.disc or unknown),
+                "Album": lambda x: (x.albumKey, x.disc or unknown),
+                "Artist": lambda x: (x.artistKey, x.year or unknown, x.albumKey, x.disc or unknown)}
+        return self._view(("playlist", playlist, orderBy, reverse and orderBy in keys),
+                          lambda: self._playlists[playlist], keys.get(orderBy))
@@ -0,0 +1,459 @@
+import array
+import datetime
+import gc
+import gzip
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+
+TIME_FORMAT = "%Y%m%d%H%M%S"
+MAGIC_V1 = b"\x01\xff"
+MAGIC_V2 = b"MPLB"
+VERSION = 4
+COMPRESSED = 0x1
+
+HEADER = struct.Struct("<4sHH14s")
+SEQUENCE = struct.Struct("<Q")  # follows the header since version 3
+COUNT = struct.Struct("<I")
+
+V1_HEADER = struct.Struct("<h14s")
+SHORT = struct.Struct("<h")
+INT = struct.Struct("<i")
+DIRECTORY = struct.Struct("<qh")
+FINGERPRINT = struct.Struct("<qqQ")
+
+RECORD = struct.Struct("<II")  # length and crc32 of the journal entry that follows
+ENTRY = struct.Struct("<QB")  # sequence, operation, followed by the arguments
+PLAYLIST_CREATED, PLAYLIST_DELETED, PLAYLIST_RENAMED, SONG_ADDED, SONG_REMOVED = range(1, 6)
+
+MAGIC_TAGS = b"MPTC"
+TAGS_VERSION = 1
+TAGS_HEADER = struct.Struct("<4sHH")
+
+
+class LibraryData:
+    """Everything that is stored in the library file. Attribute files maps song paths
+    to (artist, album, year, title, track number, disc number, length), fingerprints maps
+    song paths, and the paths of mp3 files whose tags could not be read, to (size, mtime in ns, inode),
+    directories maps directory paths to
+    (mtime in ns, [subdirectory paths]) and playlists map names to lists of song paths.
+    Attribute journalSequence is the sequence number of the last playlist journal record
+    included in the playlists."""
+
+    def __init__(self) -> None:
+        self.version = VERSION
+        self.timestamp = datetime.datetime.min
+        self.folders = []
+        self.files = {}
+        self.fingerprints = {}
+        self.directories = {}
+        self.playlists = {}
+        self.journalSequence = 0
+
+
+def read(path: str) -> LibraryData:
+    """Reads a library file in any of the supported formats,
+    raises OSError or ValueError if the file can't be read."""
+    with open(path, "rb") as fh:
+        magic = fh.read(len(MAGIC_V2))
+    if magic == MAGIC_V2:
+        return readV2(path)
+    return readV1(path)
+
+
+def readV1(path: str) -> LibraryData:
+    """Reads the original gzip format made of 2-byte length-prefixed strings:
+    magic, folder count, timestamp, folders, magic, songs (path + 7 attributes + magic), magic,
+    playlist count, playlists (name + songs + magic) and the optional directory and fingerprint sections.
+    The whole file is decompressed at once and walked with precompiled structs, the cyclic
+    garbage collector is paused meanwhile as the parser only creates acyclic strings and lists."""
+    data = LibraryData()
+    data.version = 1
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, "rb") as fh:
+            buffer = gzip.decompress(fh.read())
+        if not buffer.startswith(MAGIC_V1):
+            raise ValueError("not a library file")
+        unpackShort = SHORT.unpack_from
+        folderCount, timestamp = V1_HEADER.unpack_from(buffer, 2)
+        timestamp = timestamp.decode()
+        offset = 2 + V1_HEADER.size
+        for _ in range(folderCount):
+            length = unpackShort(buffer, offset)[0]
+            offset += 2
+            data.folders.append(buffer[offset:offset + length].decode("utf8"))
+            offset += length
+        if not buffer.startswith(MAGIC_V1, offset):
+            raise ValueError("file corrupted")
+        offset += 2
+        files = data.files
+        while not buffer.startswith(MAGIC_V1, offset):
+            length = unpackShort(buffer, offset)[0]
+            offset += 2
+            song = buffer[offset:offset + length].decode("utf8")
+            offset += length
+            attributes = []
+            for _ in range(7):
+                length = unpackShort(buffer, offset)[0]
+                offset += 2
+                attributes.append(buffer[offset:offset + length].decode("utf8"))
+                offset += length
+            files[song] = attributes
+            if not buffer.startswith(MAGIC_V1, offset):
+                raise ValueError("file corrupted")
+            offset += 2
+        offset += 2
+        playlistCount = unpackShort(buffer, offset)[0]
+        offset += 2
+        for _ in range(playlistCount):
+            length = unpackShort(buffer, offset)[0]
+            offset += 2
+            playlist = buffer[offset:offset + length].decode("utf8")
+            offset += length
+            songs = data.playlists[playlist] = []
+            while not buffer.startswith(MAGIC_V1, offset):
+                length = unpackShort(buffer, offset)[0]
+                offset += 2
+                songs.append(buffer[offset:offset + length].decode("utf8"))
+                offset += length
+            offset += 2
+        if buffer.startswith(MAGIC_V1, offset):
+            dirCount = INT.unpack_from(buffer, offset + 2)[0]
+            offset += 6
+            for _ in range(dirCount):
+                length = unpackShort(buffer, offset)[0]
+                offset += 2
+                directory = buffer[offset:offset + length].decode("utf8")
+                offset += length
+                mtime, subdirCount = DIRECTORY.unpack_from(buffer, offset)
+                offset += DIRECTORY.size
+                subdirs = []
+                for _ in range(subdirCount):
+                    length = unpackShort(buffer, offset)[0]
+                    offset += 2
+                    subdirs.append(os.path.join(directory, buffer[offset:offset + length].decode("utf8")))
+                    offset += length
+                data.directories[directory] = (mtime, subdirs)
+        if buffer.startswith(MAGIC_V1, offset):
+            count = INT.unpack_from(buffer, offset + 2)[0]
+            offset += 6
+            for song, (size, mtime, inode) in zip(files, FINGERPRINT.iter_unpack(
+                    buffer[offset:offset + FINGERPRINT.size * min(count, len(files))])):
+                if size >= 0:
+                    data.fingerprints[song] = (size, mtime, inode)
+            offset += FINGERPRINT.size * count
+        if offset > len(buffer):
+            raise ValueError("file corrupted: unexpected end of file")
+    except (struct.error, EOFError, UnicodeDecodeError, zlib.error, gzip.BadGzipFile) as error:
+        raise ValueError(f"file corrupted: {error}")
+    finally:
+        if collecting:
+            gc.enable()
+    data.timestamp = datetime.datetime.strptime(timestamp, TIME_FORMAT)
+    return data
+
+
+def readV2(path: str) -> LibraryData:
+    """Reads the columnar format written by write. An uncompressed file is memory-mapped
+    and its columns are read straight from the mapping."""
+    with open(path, "rb") as fh:
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            try:
+                magic, version, flags, timestamp = HEADER.unpack_from(mapped, 0)
+                sequence, offset = 0, HEADER.size
+                if version >= 3:
+                    sequence = SEQUENCE.unpack_from(mapped, offset)[0]
+                    offset += SEQUENCE.size
+            except struct.error:
+                raise ValueError("file corrupted: missing header")
+            if magic != MAGIC_V2 or version > VERSION:
+                raise ValueError("unsupported library file version")
+            if flags & COMPRESSED:
+                try:
+                    body = zlib.decompress(mapped[offset:])
+                except zlib.error as error:
+                    raise ValueError(f"file corrupted: {error}")
+                data = _readBody(memoryview(body), version)
+            else:
+                view = memoryview(mapped)[offset:]
+                try:
+                    data = _readBody(view, version)
+                finally:
+                    view.release()
+    data.version = version
+    data.journalSequence = sequence
+    data.timestamp = datetime.datetime.strptime(timestamp.decode(), TIME_FORMAT)
+    return data
+
+
+class _Reader:
+    """Walks the body of a v2 file, every column is read in a single call."""
+
+    def __init__(self, view: memoryview) -> None:
+        self.view = view
+        self.offset = 0
+
+    def count(self) -> int:
+        value = COUNT.unpack_from(self.view, self.offset)[0]
+        self.offset += COUNT.size
+        return value
+
+    def column(self, typecode: str, count: int) -> list:
+        values = array.array(typecode)
+        end = self.offset + values.itemsize * count
+        if end > len(self.view):
+            raise ValueError("file corrupted: unexpected end of file")
+        values.frombytes(self.view[self.offset:end])
+        if sys.byteorder != "little":
+            values.byteswap()
+        self.offset = end
+        return values.tolist()
+
+    def strings(self) -> list:
+        count = self.count()
+        length = self.count()
+        blob = bytes(self.view[self.offset:self.offset + length])
+        self.offset += length
+        strings = blob.decode("utf8").split("\0") if count else []
+        if len(strings) != count:
+            raise ValueError("file corrupted: string table")
+        return strings
+
+
+def _readBody(view: memoryview, version: int) -> LibraryData:
+    data = LibraryData()
+    reader = _Reader(view)
+    try:
+        strings = reader.strings()
+        data.folders = [strings[n] for n in reader.column("I", reader.count())]
+
+        songCount = reader.count()
+        directories = reader.column("I", songCount)
+        names = reader.column("I", songCount)
+        columns = [reader.column("I", songCount) for _ in range(7)]
+        sizes = reader.column("q", songCount)
+        mtimes = reader.column("q", songCount)
+        inodes = reader.column("Q", songCount)
+        songs = [strings[directory] + strings[name] for directory, name in zip(directories, names)]
+        string = strings.__getitem__
+        data.files = dict(zip(songs, zip(*[list(map(string, column)) for column in columns])))
+        data.fingerprints = {song: (size, mtime, inode) for song, size, mtime, inode
+                             in zip(songs, sizes, mtimes, inodes) if size >= 0}
+
+        dirCount = reader.count()
+        paths = reader.column("I", dirCount)
+        mtimes = reader.column("q", dirCount)
+        subdirCounts = reader.column("I", dirCount)
+        subdirs = iter(reader.column("I", sum(subdirCounts)))
+        for path, mtime, subdirCount in zip(paths, mtimes, subdirCounts):
+            data.directories[strings[path]] = (mtime, [strings[next(subdirs)] for _ in range(subdirCount)])
+
+        playlistCount = reader.count()
+        playlistNames = reader.column("I", playlistCount)
+        lengths = reader.column("I", playlistCount)
+        entries = iter(reader.column("I", sum(lengths)))
+        for name, length in zip(playlistNames, lengths):
+            data.playlists[strings[name]] = [songs[next(entries)] for _ in range(length)]
+
+        if version >= 4:
+            skippedCount = reader.count()
+            directories = reader.column("I", skippedCount)
+            names = reader.column("I", skippedCount)
+            fingerprints = zip(reader.column("q", skippedCount), reader.column("q", skippedCount),
+                               reader.column("Q", skippedCount))
+            data.fingerprints.update((strings[directory] + strings[name], fingerprint)
+                                     for directory, name, fingerprint in zip(directories, names, fingerprints))
+    except (IndexError, struct.error, UnicodeDecodeError) as error:
+        raise ValueError(f"file corrupted: {error}")
+    return data
+
+
+def _split(path: str) -> tuple:
+    """Splits a path after its last separator, so that both parts concatenated give the original path."""
+    index = max(path.rfind("/"), path.rfind("\\")) + 1
+    return path[:index], path[index:]
+
+
+def write(path: str, data: LibraryData, compress: bool = True) -> None:
+    """Writes the library in the columnar format: a header (magic, version, flags, timestamp,
+    journal sequence) followed by a body, zlib-compressed unless compress is False. The body starts with a table
+    of all distinct strings, every other section refers to them by their index:
+    folders, songs as columns (directory, file name, 7 attributes, size, mtime, inode),
+    directories (path, mtime, subdirectory count, subdirectories), playlists (name, length, song indices)
+    and the files whose tags could not be read as columns (directory, file name, size, mtime, inode).
+    The file is written under a temporary name and renamed over the old one, so a crash
+    while saving never leaves a truncated library behind."""
+    stringIds = {}
+
+    def stringId(string: str) -> int:
+        if string not in stringIds:
+            stringIds[string] = len(stringIds)
+        return stringIds[string]
+
+    sections = []
+    sections.append(COUNT.pack(len(data.folders)) + _column("I", [stringId(folder) for folder in data.folders]))
+
+    songs = list(data.files)
+    songIndex = {song: n for n, song in enumerate(songs)}
+    parts = [_split(song) for song in songs]
+    songSection = [COUNT.pack(len(songs)),
+                   _column("I", [stringId(directory) for directory, _ in parts]),
+                   _column("I", [stringId(name) for _, name in parts])]
+    for field in range(7):
+        songSection.append(_column("I", [stringId(data.files[song][field]) for song in songs]))
+    fingerprints = [data.fingerprints.get(song, (-1, 0, 0)) for song in songs]
+    for field, typecode in enumerate("qqQ"):
+        songSection.append(_column(typecode, [fingerprint[field] for fingerprint in fingerprints]))
+    sections.append(b"".join(songSection))
+
+    directories = list(data.directories.items())
+    sections.append(b"".join([COUNT.pack(len(directories)),
+                              _column("I", [stringId(directory) for directory, _ in directories]),
+                              _column("q", [mtime for _, (mtime, _) in directories]),
+                              _column("I", [len(subdirs) for _, (_, subdirs) in directories]),
+                              _column("I", [stringId(subdir) for _, (_, subdirs) in directories
+                                            for subdir in subdirs])]))
+
+    playlists = [(name, [songIndex[song] for song in songs if song in songIndex])
+                 for name, songs in data.playlists.items()]
+    sections.append(b"".join([COUNT.pack(len(playlists)),
+                              _column("I", [stringId(name) for name, _ in playlists]),
+                              _column("I", [len(entries) for _, entries in playlists]),
+                              _column("I", [entry for _, entries in playlists for entry in entries])]))
+
+    skipped = [(_split(file), fingerprint) for file, fingerprint in data.fingerprints.items()
+               if file not in data.files]
+    sections.append(b"".join([COUNT.pack(len(skipped)),
+                              _column("I", [stringId(directory) for (directory, _), _ in skipped]),
+                              _column("I", [stringId(name) for (_, name), _ in skipped]),
+                              *[_column(typecode, [fingerprint[field] for _, fingerprint in skipped])
+                                for field, typecode in enumerate("qqQ")]]))
+
+    blob = "\0".join(string.replace("\0", "") for string in stringIds).encode("utf8")
+    body = b"".join([COUNT.pack(len(stringIds)), COUNT.pack(len(blob)), blob, *sections])
+    header = HEADER.pack(MAGIC_V2, VERSION, COMPRESSED if compress else 0,
+                         data.timestamp.strftime(TIME_FORMAT).encode()) + SEQUENCE.pack(data.journalSequence)
+    _writeAtomically(path, [header, zlib.compress(body, 6) if compress else body])
+
+
+def _column(typecode: str, values: list) -> bytes:
+    values = array.array(typecode, values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _writeAtomically(path: str, chunks: list) -> None:
+    """Writes the chunks under a temporary name and renames the file over the old one."""
+    temporary = f"{path}.tmp"
+    try:
+        with open(temporary, "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(temporary, path)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+
+
+def _record(sequence: int, operation: int, args: tuple) -> bytes:
+    entry = ENTRY.pack(sequence, operation) + "\0".join(args).encode("utf8")
+    return RECORD.pack(len(entry), zlib.crc32(entry)) + entry
+
+
+def appendJournal(path: str, records: list) -> None:
+    """Appends (sequence, operation, (arguments, ...)) records to the playlist journal.
+    A record is the length and crc32 of its entry followed by the entry itself: sequence,
+    operation and the NUL-separated arguments, e.g. (n, SONG_ADDED, (playlist, song))."""
+    with open(path, "ab") as fh:
+        fh.write(b"".join(_record(*record) for record in records))
+
+
+def writeJournal(path: str, records: list) -> None:
+    """Replaces the playlist journal with the given records, removes it if there are none."""
+    if not records:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as fh:
+        fh.write(b"".join(_record(*record) for record in records))
+    os.replace(temporary, path)
+
+
+def readJournal(path: str) -> list:
+    """Reads the playlist journal as a list of (sequence, operation, (arguments, ...)) records,
+    returns an empty list if there is no journal. Reading stops at the first incomplete
+    or damaged record, as left behind by a crash while appending."""
+    try:
+        with open(path, "rb") as fh:
+            buffer = fh.read()
+    except FileNotFoundError:
+        return []
+    records = []
+    offset = 0
+    while offset + RECORD.size <= len(buffer):
+        length, crc = RECORD.unpack_from(buffer, offset)
+        offset += RECORD.size
+        entry = buffer[offset:offset + length]
+        if len(entry) != length or length < ENTRY.size or zlib.crc32(entry) != crc:
+            break
+        sequence, operation = ENTRY.unpack_from(entry)
+        try:
+            args = tuple(entry[ENTRY.size:].decode("utf8").split("\0"))
+        except UnicodeDecodeError:
+            break
+        records.append((sequence, operation, args))
+        offset += length
+    return records
+
+
+def readTagCache(path: str) -> dict:
+    """Reads the tag cache written by writeTagCache as a dictionary that maps
+    (device, inode, size, mtime in ns) of a file to (last used, [7 attributes]),
+    raises OSError or ValueError if the file can't be read."""
+    with open(path, "rb") as fh:
+        buffer = fh.read()
+    try:
+        magic, version, _ = TAGS_HEADER.unpack_from(buffer, 0)
+    except struct.error:
+        raise ValueError("file corrupted: missing header")
+    if magic != MAGIC_TAGS or version > TAGS_VERSION:
+        raise ValueError("unsupported tag cache version")
+    try:
+        reader = _Reader(memoryview(zlib.decompress(buffer[TAGS_HEADER.size:])))
+        strings = reader.strings()
+        count = reader.count()
+        keys = zip(*[reader.column(typecode, count) for typecode in "QQqq"])
+        lastUsed = reader.column("q", count)
+        columns = [reader.column("I", count) for _ in range(7)]
+        return {key: (used, [strings[n] for n in values]) for key, used, *values in zip(keys, lastUsed, *columns)}
+    except (IndexError, struct.error, UnicodeDecodeError, zlib.error) as error:
+        raise ValueError(f"file corrupted: {error}")
+
+
+def writeTagCache(path: str, entries: dict) -> None:
+    """Writes the tag cache atomically: a header (magic, version, flags) followed by a zlib-compressed
+    body of the string table and the entries as columns (device, inode, size, mtime, last used, 7 attributes)."""
+    stringIds = {}
+    items = list(entries.items())
+    columns = [_column(typecode, [key[field] for key, _ in items]) for field, typecode in enumerate("QQqq")]
+    columns.append(_column("q", [used for _, (used, _) in items]))
+    for field in range(7):
+        columns.append(_column("I", [stringIds.setdefault(values[field], len(stringIds))
+                                     for _, (_, values) in items]))
+    blob = "\0".join(string.replace("\0", "") for string in stringIds).encode("utf8")
+    body = b"".join([COUNT.pack(len(stringIds)), COUNT.pack(len(blob)), blob, COUNT.pack(len(items)), *columns])
+    _writeAtomically(path, [TAGS_HEADER.pack(MAGIC_TAGS, TAGS_VERSION, COMPRESSED), zlib.compress(body, 6)])
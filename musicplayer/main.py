@@ -1,26 +1,84 @@
 import gzip
+import os
 import struct
+from typing import Iterator
 
-from PyQt5.QtCore import QUrl
+from PyQt5.QtCore import QUrl, QThread, QSocketNotifier, pyqtSignal
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaPlaylist, QAudio, QMediaContent
-from musicplayer import library
+from musicplayer import library, watcher
 from musicplayer.gui import *
 
 
 ARTIST, ALBUM, YEAR, NAME, TRACK, DISC, LENGTH = range(7)
 
 
+class LibraryScanner(QThread):
+    """Runs a library scan (Library.scan or Library.scanPaths) outside of the GUI thread.
+    The changes found are passed back in batches through the batchReady signal
+    and applied in the GUI thread. A scan that raises an error is reported through the failed
+    signal, the changes found up to that point are kept, no songs are removed."""
+
+    batchReady = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, batches: Iterator[library.ScanBatch]) -> None:
+        super().__init__()
+        self.batches = batches
+
+    def run(self) -> None:
+        try:
+            for batch in self.batches:
+                if self.isInterruptionRequested():
+                    return
+                self.batchReady.emit(batch)
+        except Exception as error:  # an exception leaving run would abort the program
+            self.failed.emit(f"{type(error).__name__}: {error}")
+
+
+class PlayQueue:
+    """The songs of the QMediaPlaylist as paths in the form the library uses, kept in step with
+    the playlist through its signals, so the queued songs are known without converting its media."""
+
+    def __init__(self, playlist: QMediaPlaylist) -> None:
+        self.playlist = playlist
+        self.songs = []
+        playlist.mediaInserted.connect(self.inserted)
+        playlist.mediaRemoved.connect(self.removed)
+        playlist.mediaChanged.connect(self.changed)
+
+    @staticmethod
+    def path(media: QMediaContent) -> str:
+        return os.path.normpath(media.request().url().toLocalFile())
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+    def __getitem__(self, row: int) -> str:
+        return self.songs[row]
+
+    def inserted(self, start: int, end: int) -> None:
+        self.songs[start:start] = [self.path(self.playlist.media(n)) for n in range(start, end + 1)]
+
+    def removed(self, start: int, end: int) -> None:
+        del self.songs[start:end + 1]
+
+    def changed(self, start: int, end: int) -> None:
+        self.songs[start:end + 1] = [self.path(self.playlist.media(n)) for n in range(start, end + 1)]
+
+
 class Control:
     """A class that handles the logic behind the program by manipulating the GUI classes
     and calling their methods in response to received signals."""
 
     MAGIC = b"\x01\xff"
+    FULL_SCAN_EVERY = 40  # every n-th library scan also checks unchanged directories
 
     def __init__(self, screens: list) -> None:
         self.player = QMediaPlayer()
         self.player.setAudioRole(QAudio.MusicRole)
         self.playlist = QMediaPlaylist()
         self.player.setPlaylist(self.playlist)
+        self.queue = PlayQueue(self.playlist)  # connected before the Now Playing model, which reads the songs from it
         self.mainWindow = MainWindow(self, screens)
         self.mainArea = self.mainWindow.centralWidget().upperBox.mainArea
         self.songList = self.mainWindow.centralWidget().upperBox.songList
@@ -44,7 +102,30 @@ class Control:
         self.libraryUpdateTimer = QTimer()
         self.libraryUpdateTimer.setInterval(15_000)
         self.libraryUpdateTimer.timeout.connect(self.updateLibrary)
-        self.libraryUpdateTimer.start()
+
+        self.scanner = None
+        self.rescanRequested = False
+        self.fullRescanRequested = False
+        self.scanCount = 0
+
+        self.watcher = None
+        self.watchedChanges = set()
+        self.watchedRemovals = set()
+        if watcher.InotifyWatcher.isAvailable():
+            try:
+                self.watcher = watcher.InotifyWatcher()
+            except OSError:
+                self.watcher = None
+        if self.watcher is not None:
+            # changes are collected for a moment so that copying a whole album is read at once
+            self.watcherTimer = QTimer()
+            self.watcherTimer.setInterval(500)
+            self.watcherTimer.setSingleShot(True)
+            self.watcherTimer.timeout.connect(self.updateWatchedChanges)
+            self.watcherNotifier = QSocketNotifier(self.watcher.fileno(), QSocketNotifier.Read)
+            self.watcherNotifier.activated.connect(self.watcherActivated)
+        else:
+            self.libraryUpdateTimer.start()
 
         self._connection = None
         self.connections()
@@ -80,33 +161,109 @@ class Control:
         self.mediaControlArea.volumeControl.sliderMoved.connect(self.volumeChange)
 
     def setAreas(self) -> None:
-        """Called after the GUI is created to provide user with a feedback
-        that the program is running in case a larger amount of songs will be added
-        when the Library class is initialized."""
-        # TODO add a tooltip that will notify the user larger amount of songs is being loaded
-        #  (freezes the program as the execution moves to the Library class.)
-        self.library = library.Library()
+        """Called after the GUI is created, shows the library as it was saved
+        on the last run and the view that was displayed then (the first artist on the first run)
+        and starts scanning the library folders in the background."""
+        self.library = library.Library(scan=False)
         self.types = {"artist": self.library.getSongsForArtist,
                       "album": self.library.getSongsForAlbum,
                       "playlist": self.library.getSongsForPlaylist}
         self.mainArea.setAreas(self.library)
         self.setUpTimer.deleteLater()
         self.setUpTimer = None
-        self.getSongs(self.displayedType, self.displayedName)
+        self.getSongs(self.displayedType or "artist", self.displayedName or "")
         if self.songListWidth is not None:
             songListGeometry = self.songList.geometry()
             self.songList.preferredWidth = songListGeometry.width() - self.songListWidth
             self.mainWindow.centralWidget().upperBox.line.resizeWidgets(songListGeometry.width() - self.songListWidth)
+        self.watchLibraryFolders()
+        self.updateLibrary(True)  # files changed while the player was closed may not change their directory
 
-    def updateLibrary(self) -> None:
-        self.library.update()
-        self.mainArea.updateView(self.library)
+    def updateLibrary(self, full: bool = False) -> None:
+        """Starts scanning the library folders in a background thread. If a scan
+        is already running, another one is started once it finishes."""
+        if self.library is None:
+            return
+        if self.scanner is not None:
+            self.rescanRequested = True
+            self.fullRescanRequested = self.fullRescanRequested or full
+            return
+        self.scanCount += 1
+        self.startScanner(self.library.scan(full or self.scanCount % self.FULL_SCAN_EVERY == 0))
+
+    def updateWatchedChanges(self) -> None:
+        """Reads only the files reported by the watcher. If a scan is running,
+        the changes are read once it finishes."""
+        if self.library is None or self.scanner is not None:
+            return
+        if not self.watchedChanges and not self.watchedRemovals:
+            return
+        changed, removed = self.watchedChanges, self.watchedRemovals
+        self.watchedChanges, self.watchedRemovals = set(), set()
+        self.startScanner(self.library.scanPaths(changed, removed))
+
+    def startScanner(self, batches: Iterator[library.ScanBatch]) -> None:
+        self.scanner = LibraryScanner(batches)
+        self.scanner.batchReady.connect(self.applyLibraryBatch)
+        self.scanner.failed.connect(self.libraryScanFailed)
+        self.scanner.finished.connect(self.libraryScanFinished)
+        self.scanner.start()
+
+    def applyLibraryBatch(self, batch: library.ScanBatch) -> None:
+        """Called for every batch of changes found by the scanner, updates the view progressively."""
+        self.library.applyBatch(batch)
+        self.mainArea.updateView(self.library, batch)
+
+    def libraryScanFailed(self, error: str) -> None:
+        print(f"library scan failed: {error}")
+
+    def libraryScanFinished(self) -> None:
+        self.library.finishScan()
+        self.scanner.deleteLater()
+        self.scanner = None
+        self.checkCurrentSong()
+        self.watchLibraryFolders()
+        if self.rescanRequested:
+            full = self.fullRescanRequested
+            self.rescanRequested = self.fullRescanRequested = False
+            self.updateLibrary(full)
+        else:
+            self.updateWatchedChanges()
+
+    def watchLibraryFolders(self) -> None:
+        """Registers all directories known to the library with the watcher. If a directory can't be
+        watched (e.g. the limit of inotify watches is reached) or a library folder is on a network drive,
+        where the changes made by other machines are not reported, the library is scanned periodically."""
+        if self.watcher is not None:
+            periodic = not all(map(self.watcher.reportsChanges, self.library.folders))
+            for directory in self.library.directories:
+                if not self.watcher.addWatch(directory):
+                    periodic = True
+            if periodic and not self.libraryUpdateTimer.isActive():
+                self.libraryUpdateTimer.start()
+
+    def watcherActivated(self) -> None:
+        """Collects the changes reported by the watcher. A lost event queue or a library
+        folder deleted or moved away means the changes are unknown and the library is scanned as a whole."""
+        overflow = False
+        for kind, path in self.watcher.read():
+            if kind in ("overflow", "lost"):
+                overflow = True
+            elif kind == "removed":
+                self.watchedRemovals.add(path)
+                self.watchedChanges.discard(path)
+            else:
+                self.watchedChanges.add(path)
+                self.watchedRemovals.discard(path)
+        if overflow:
+            self.updateLibrary(True)
+        self.watcherTimer.start()
 
     def updateCurrentSong(self) -> None:
         """Update all areas that may display information about the currently
         playing song - SongList, Now Playing tab, BottomBox"""
-        media = self.player.currentMedia()
-        self.currentSong = media.request().url().toLocalFile().replace("/", "\\")
+        self.currentSong = PlayQueue.path(self.player.currentMedia())
+        self.updateScanPlayback()
         if self.currentSong in self.library.library:
             self.songList.updateActiveSong(self.currentSong)
             self.mainArea.updateActiveSong(self.playlist.currentIndex())
@@ -122,6 +279,13 @@ class Control:
         index = self.playlist.currentIndex()
         if index == -1:
             self.stopButtonClick()
+        self.updateScanPlayback()
+
+    def updateScanPlayback(self) -> None:
+        """Library scans read slower from the drive the current song is played from."""
+        if self.library is not None:
+            playing = self.player.state() == QMediaPlayer.PlayingState
+            self.library.setPlayback(self.currentSong if playing else None)
 
     def getSongs(self, isType: str, name: str) -> None:
         """Retrieves the songs for a given artist, album or playlist based on type
@@ -152,13 +316,10 @@ class Control:
         """Called when user double-clicks on an artist/album/playlist widget or a song
         in right-hand side panel."""
         self.playlist.clear()
-        index = 0
-        loopIndex = 0
-        for songPath in self.songList.garbageProtector:
-            if song == songPath:
-                index = loopIndex
-            self.playlist.addMedia(QMediaContent(QUrl.fromLocalFile(songPath)))
-            loopIndex += 1
+        songs = list(self.songList.songs)
+        index = songs.index(song) if song in self.songList.songs else 0
+        if songs:
+            self.playlist.addMedia([QMediaContent(QUrl.fromLocalFile(songPath)) for songPath in songs])
         if self.playlist.isEmpty():
             return
         self.player.play()
@@ -167,7 +328,6 @@ class Control:
         self.playing = True
         self.mediaControlArea.playButton.updatePictures(bottom.pausePixmap,
                                                         bottom.pauseHoverPixmap, False)
-        self.mainArea.setNowPlayingArea(self.library)
         self.mainArea.updateActiveSong(self.playlist.currentIndex())
 
     def playSongWidget(self, songPath: str, afterCurrent: bool = False) -> None:
@@ -176,57 +336,49 @@ class Control:
             self.playlist.insertMedia(index, QMediaContent(QUrl.fromLocalFile(songPath)))
         else:
             self.playlist.addMedia(QMediaContent(QUrl.fromLocalFile(songPath)))
-        self.mainArea.setNowPlayingArea(self.library)
         self.mainArea.updateActiveSong(self.playlist.currentIndex())
         self.playing = True
 
-    def removeFromNowPlaying(self, widget) -> None:
+    def removeFromNowPlaying(self, row: int) -> None:
+        """Called from the Now Playing tab with the row of the song to be removed."""
         if self.playlist.mediaCount() > 1:
-            for row in range(self.mainArea.nowPlayingLayout.rowCount()):
-                for column in range(self.mainArea.nowPlayingLayout.columnCount()):
-                    if self.mainArea.nowPlayingLayout.itemAtPosition(row, column).widget() is widget:
-                        self.playlist.removeMedia(row - 1)
-                        break
-                else:
-                    continue
-                break
+            self.playlist.removeMedia(row)
         else:
             self.stopButtonClick()
             self.playlist.clear()
-        self.mainArea.setNowPlayingArea(self.library)
         if self.playing:
             self.mainArea.updateActiveSong(self.playlist.currentIndex())
 
+    def moveInNowPlaying(self, source: int, target: int) -> None:
+        """Called when a song is dragged in the Now Playing tab, target is the row it is dropped before."""
+        if target > source:
+            target -= 1
+        if self.mainArea.nowPlayingModel.moveMedia(source, target) and self.playing:
+            self.mainArea.updateActiveSong(self.playlist.currentIndex())
+
     def playMediaWidget(self, isType: str, target: str, startOver: bool, afterCurrent: bool) -> None:
-        """Called from MediaWidget - plays all songs for MediaWidget's type and name."""
+        """Called from MediaView - plays all songs for the artist, album or playlist.
+        The songs are added to the playlist at once, so the Now Playing tab inserts their rows at once."""
         if startOver:
             self.playlist.clear()
-        if afterCurrent:
-            index = self.playlist.currentIndex() + 1
-            for songPath in self.types[isType](target):
-                self.playlist.insertMedia(index, QMediaContent(QUrl.fromLocalFile(songPath)))
-                index += 1
-        else:
-            for songPath in self.types[isType](target):
-                self.playlist.addMedia(QMediaContent(QUrl.fromLocalFile(songPath)))
+        songs = [QMediaContent(QUrl.fromLocalFile(songPath)) for songPath in self.types[isType](target)]
+        if songs and afterCurrent:
+            self.playlist.insertMedia(self.playlist.currentIndex() + 1, songs)
+        elif songs:
+            self.playlist.addMedia(songs)
         if startOver:
             self.player.play()
             self.playing = True
             self.mediaControlArea.playButton.updatePictures(bottom.pausePixmap,
                                                             bottom.pauseHoverPixmap, False)
-        self.mainArea.setNowPlayingArea(self.library)
         self.mainArea.updateActiveSong(self.playlist.currentIndex())
 
-    def playFromNowPlaying(self, song: str) -> None:
-        """Called when user double-clicks on a song in the Now Playing tab."""
-        for n in range(self.playlist.mediaCount()):
-            media = self.playlist.media(n)
-            if song == media.request().url().toLocalFile().replace("/", "\\"):
-                self.playlist.setCurrentIndex(n)
-                if not self.playing:
-                    self.player.play()
-                    self.playing = True
-                return
+    def playFromNowPlaying(self, row: int) -> None:
+        """Called with the row of the song the user double-clicked in the Now Playing tab."""
+        self.playlist.setCurrentIndex(row)
+        if not self.playing:
+            self.player.play()
+            self.playing = True
 
     def createPlaylist(self, playlistName: str) -> None:
         self.library.createPlaylist(playlistName)
@@ -234,41 +386,49 @@ class Control:
 
     def addToExistingPlaylist(self, playlist: str, songOrWidget: str, isType: str) -> None:
         if isType in self.types:
-            for song in self.types[isType](songOrWidget):
-                self.library.addToPlaylist(playlist, song)
+            self.library.addToPlaylist(playlist, *self.types[isType](songOrWidget))
         else:
             self.library.addToPlaylist(playlist, songOrWidget)
-        self.library.update()
 
     def removeFromPlaylist(self, playlist: str, song: str) -> None:
         self.library.deleteFromPlaylist(playlist, song)
         self.mainArea.setMainAreaPlaylists(self.library)
-        self.library.update()
         self.getSongs("playlist", playlist)
 
     def renamePlaylist(self, playlistName: str, newPlaylistName: str) -> None:
         self.library.renamePlaylist(playlistName, newPlaylistName)
         self.mainArea.setMainAreaPlaylists(self.library)
-        self.library.update()
 
     def deletePlaylist(self, playlistName: str) -> None:
         self.library.deletePlaylist(playlistName)
         self.mainArea.setMainAreaPlaylists(self.library)
-        self.library.update()
 
     def addWatchedFolder(self, folder: str) -> None:
         """Adds a folder to the Library class. all mp3 files within the folder
-        and its sub-folders will be added to the library and accessible to the player."""
-        self.library.addFolder(folder.replace("/", "\\"))
-        self.mainArea.updateView(self.library)
+        and its sub-folders will be added to the library and accessible to the player.
+        A folder inside another library folder is already scanned and does not start a scan."""
+        if self.library.addFolder(os.path.normpath(folder), update=False):
+            self.updateLibrary()
 
     def removeWatchedFolder(self, folder: str) -> None:
-        """Removes folder from the library, updates view and stops playback if
-        the current song was in the now-removed folder."""
-        self.library.deleteFolder(folder)
-        self.mainArea.updateView(self.library)
-        if self.currentSong not in self.library.library:
-            self.songList.updateSongList([], [], "", "")
+        """Removes folder from the library, its songs are removed without scanning the other folders,
+        the view is updated and the playback stopped if the current song was in the now-removed folder.
+        A running scan may have found songs in the folder already, the library is scanned again after it."""
+        batch = self.library.deleteFolder(folder, update=False)
+        if batch:
+            self.applyLibraryBatch(batch)
+            self.library.finishScan()
+            self.checkCurrentSong()
+        if self.watcher is not None:
+            self.watcher.removeTree(folder)
+            self.watchLibraryFolders()  # the directories still covered by other library folders
+        if self.scanner is not None:
+            self.updateLibrary()
+
+    def checkCurrentSong(self) -> None:
+        """Stops playback if the current song is no longer in the library."""
+        if self.currentSong and self.currentSong not in self.library.library:
+            self.songList.updateSongList([], {}, "", None, self.displayedType)
             self.player.stop()
             self.playlist.clear()
             self.mediaControlArea.updateSongInfo("")
@@ -315,10 +475,8 @@ class Control:
     def stopButtonClick(self) -> None:
         self.playing = False
         self.player.stop()
-        if self.songList.nowPlayingSong is not None:
-            self.songList.nowPlayingSong.clear()
-        if self.mainArea.nowPlayingSong is not None:
-            self.mainArea.nowPlayingSong.clear()
+        self.songList.clearActiveSong()
+        self.mainArea.clearActiveSong()
         self.mediaControlArea.updatePlayButton(self.playing, False)
 
     def mute(self) -> None:
@@ -366,6 +524,15 @@ class Control:
         self.mediaControlArea.volumeControl.sliderMoved.disconnect()
 
     def close(self) -> None:
+        if self.scanner is not None:
+            self.library.progress.cancel()
+            self.scanner.requestInterruption()
+            self.scanner.wait()
+        if self.library is not None:
+            self.library.flush()
+        if self.watcher is not None:
+            self.watcherNotifier.setEnabled(False)
+            self.watcher.close()
         self.disconnect()
         self.player.stop()
         self.mainTimer.stop()
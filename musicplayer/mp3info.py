@@ -0,0 +1,282 @@
+import collections
+import os
+import re
+
+
+class UnsupportedFile(ValueError):
+    """Raised for files this module does not read (unsynchronised or compressed tags,
+    no MPEG frame near the start of the audio, ...), these are left to mutagen."""
+
+
+Frame = collections.namedtuple("Frame", ["version", "layer", "bitrate", "sampleRate", "mode", "samples", "length"])
+
+BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+MONO = 3
+
+# ID3v2 text frames and the EasyID3 keys they are returned as
+FRAMES = {b"TPE1": "artist", b"TALB": "album", b"TDRC": "date", b"TYER": "date",
+          b"TIT2": "title", b"TRCK": "tracknumber", b"TPOS": "discnumber"}
+FRAMES_V22 = {b"TP1": "artist", b"TAL": "album", b"TYE": "date",
+              b"TT2": "title", b"TRK": "tracknumber", b"TPA": "discnumber"}
+KEYS = set(FRAMES.values())
+
+
+def _syncsafe(data: bytes) -> int:
+    return data[0] << 21 | data[1] << 14 | data[2] << 7 | data[3]
+
+
+def _decodeText(data: bytes) -> list:
+    """Decodes the values of an ID3v2 text frame, the first byte being the encoding."""
+    if not data:
+        return []
+    encoding, text = data[0], data[1:]
+    if encoding == 0:
+        values = [value.decode("latin1") for value in text.split(b"\0")]
+    elif encoding == 3:
+        values = [value.decode("utf8") for value in text.split(b"\0")]
+    elif encoding in (1, 2):
+        codec = "utf-16" if encoding == 1 else "utf-16-be"
+        values = []
+        start = 0
+        for n in range(0, len(text) - 1, 2):
+            if text[n] == 0 and text[n + 1] == 0:
+                values.append(text[start:n].decode(codec))
+                start = n + 2
+        values.append(text[start:].decode(codec))
+    else:
+        raise UnsupportedFile(f"unknown text encoding {encoding}")
+    if len(values) > 1 and not values[-1]:
+        values.pop()
+    return values
+
+
+def _frameHeader(data: bytes, offset: int = 0) -> [Frame, None]:
+    """Parses the MPEG frame header at offset, returns None if there is none."""
+    if offset + 4 > len(data) or data[offset] != 0xff or data[offset + 1] & 0xe0 != 0xe0:
+        return None
+    versionBits = data[offset + 1] >> 3 & 0x3
+    layerBits = data[offset + 1] >> 1 & 0x3
+    bitrateIndex = data[offset + 2] >> 4
+    rateIndex = data[offset + 2] >> 2 & 0x3
+    padding = data[offset + 2] >> 1 & 0x1
+    mode = data[offset + 3] >> 6
+    if versionBits == 1 or layerBits == 0 or rateIndex == 3 or bitrateIndex in (0, 15):
+        return None
+    version = [2.5, None, 2, 1][versionBits]
+    layer = 4 - layerBits
+    bitrate = BITRATES[(1 if version == 1 else 2, layer)][bitrateIndex] * 1000
+    sampleRate = SAMPLE_RATES[version][rateIndex]
+    if layer == 1:
+        samples, slot = 384, 4
+    elif version >= 2 and layer == 3:
+        samples, slot = 576, 1
+    else:
+        samples, slot = 1152, 1
+    length = ((samples // 8 * bitrate) // sampleRate + padding) * slot
+    return Frame(version, layer, bitrate, sampleRate, mode, samples, length)
+
+
+class MP3Info:
+    """Reads the tags and the length of a mp3 file opening it only once and reading only
+    the ID3v2 tag (frames other than the needed ones are skipped), the first MPEG frame
+    with its Xing/LAME or VBRI header and, if some tag is missing, the ID3v1 tag.
+    Attribute tags maps the EasyID3 keys (artist, album, date, title, tracknumber, discnumber)
+    to lists of values, length is in seconds and bytesRead is the number of bytes read from the file.
+    The tags and length are the same as with mutagen's EasyID3 and MP3 classes,
+    UnsupportedFile is raised for files mutagen has to be used for."""
+
+    BLOCK = 4096
+    ENOUGH_FRAMES = 4
+
+    def __init__(self, path: str) -> None:
+        self.tags = {}
+        self.length = 0.0
+        self.bytesRead = 0
+        self._data = b""
+        self._start = 0
+        with open(path, "rb", buffering=0) as self._fh:
+            self._size = os.fstat(self._fh.fileno()).st_size
+            audioStart = self._readID3v2()
+            self._readLength(audioStart)
+            if not KEYS.issubset(self.tags) and not self._readID3v1() and not audioStart:
+                raise UnsupportedFile("no ID3 tag")
+        self._fh = None
+        self._data = b""
+
+    def _read(self, offset: int, length: int) -> bytes:
+        """Returns length bytes at offset (less at the end of the file),
+        reading at least a BLOCK from the file unless they were read already."""
+        end = offset + length
+        if offset < self._start or end > self._start + len(self._data):
+            self._fh.seek(offset)
+            self._data = self._fh.read(max(length, self.BLOCK))
+            self._start = offset
+            self.bytesRead += len(self._data)
+        return self._data[offset - self._start:end - self._start]
+
+    def _readID3v2(self) -> int:
+        """Reads the needed frames of the ID3v2 tag, returns the offset of the audio data."""
+        header = self._read(0, 10)
+        if len(header) < 10 or header[:3] != b"ID3":
+            return 0
+        major, flags = header[3], header[5]
+        if major not in (2, 3, 4):
+            raise UnsupportedFile(f"ID3v2.{major}")
+        if flags & 0x80 or (major == 2 and flags & 0x40):
+            raise UnsupportedFile("unsynchronised or compressed tag")
+        end = 10 + _syncsafe(header[6:10])
+        offset = 10
+        if major == 3 and flags & 0x40:
+            offset += 4 + int.from_bytes(self._read(offset, 4), "big")
+        elif major == 4 and flags & 0x40:
+            offset += _syncsafe(self._read(offset, 4))
+        frames = {}
+        if major == 2:
+            headerSize, wanted, unsupported = 6, FRAMES_V22, 0
+        else:
+            # compression, encryption, grouping (v2.3) and also unsynchronisation, data length (v2.4)
+            headerSize, wanted, unsupported = 10, FRAMES, 0xe0 if major == 3 else 0x4f
+        while offset + headerSize <= end:
+            frameHeader = self._read(offset, headerSize)
+            if len(frameHeader) < headerSize or frameHeader[0] == 0:
+                break  # padding
+            if major == 2:
+                frameId, size, frameFlags = frameHeader[:3], int.from_bytes(frameHeader[3:6], "big"), 0
+            elif major == 3:
+                frameId, size, frameFlags = frameHeader[:4], int.from_bytes(frameHeader[4:8], "big"), frameHeader[9]
+            else:
+                frameId, size, frameFlags = frameHeader[:4], _syncsafe(frameHeader[4:8]), frameHeader[9]
+            if not re.fullmatch(rb"[A-Z0-9]+", frameId):
+                raise UnsupportedFile("invalid frame")
+            offset += headerSize
+            if frameId in wanted and frameId not in frames:
+                if frameFlags & unsupported:
+                    raise UnsupportedFile("compressed or encrypted frame")
+                data = self._read(offset, size)
+                if len(data) < size:
+                    raise UnsupportedFile("truncated frame")
+                try:
+                    frames[frameId] = _decodeText(data)
+                except UnicodeDecodeError as error:
+                    raise UnsupportedFile(error)
+            offset += size
+        for frameId, values in frames.items():
+            if frameId in (b"TYER", b"TYE") and b"TDRC" in frames:
+                continue  # converted to TDRC by mutagen only if there is none
+            self.tags[wanted[frameId]] = values
+        # skip further tags in front of the audio like mutagen does
+        while True:
+            header = self._read(end, 10)
+            if len(header) < 10 or header[:3] != b"ID3" or not _syncsafe(header[6:10]):
+                return end
+            end += 10 + _syncsafe(header[6:10])
+
+    def _readID3v1(self) -> bool:
+        """Adds the tags missing in the ID3v2 tag from the ID3v1 tag at the end of the file,
+        returns False if there is none."""
+        if self._size < 128:
+            return False
+        data = self._read(self._size - 128, 128)
+        if data[:3] != b"TAG":
+            return False
+
+        def text(value: bytes) -> str:
+            return value.split(b"\0")[0].strip().decode("latin1")
+
+        comment = data[97:127]
+        track = comment[29] if comment[28] == 0 else 0
+        for key, value in [("title", text(data[3:33])), ("artist", text(data[33:63])),
+                           ("album", text(data[63:93])), ("date", text(data[93:97])),
+                           ("tracknumber", str(track) if track else "")]:
+            if value and key not in self.tags:
+                self.tags[key] = [value]
+        return True
+
+    def _readLength(self, audioStart: int) -> None:
+        """Finds the first MPEG frame and computes the length from its Xing or VBRI header,
+        or from the bitrate and the file size if there is none. The rest of the block the tag
+        was read with is searched first, a new block is only read if there is no frame in it."""
+        buffered = self._data[audioStart - self._start:] if self._start <= audioStart else b""
+        for data in [buffered, None]:
+            if data is None:
+                data = self._read(audioStart, self.BLOCK)
+            offset = data.find(b"\xff")
+            while offset != -1:
+                frame = _frameHeader(data, offset)
+                if frame is not None:
+                    frameOffset = audioStart + offset
+                    length = self._vbrLength(frameOffset, frame) if frame.layer == 3 else None
+                    if length is not None and length >= 0:
+                        self.length = length
+                        return
+                    if length is not None or self._followingFrames(frameOffset, frame):
+                        self.length = 8 * (self._size - frameOffset) / frame.bitrate
+                        return
+                offset = data.find(b"\xff", offset + 1)
+        raise UnsupportedFile("no MPEG frame found")
+
+    def _followingFrames(self, offset: int, frame: Frame) -> bool:
+        """Checks that the frame is followed by valid frames, to skip false syncs."""
+        for count in range(1, self.ENOUGH_FRAMES):
+            offset += frame.length
+            if offset >= self._size:
+                return count >= 2
+            frame = _frameHeader(self._read(offset, 4))
+            if frame is None:
+                return False
+        return True
+
+    def _vbrLength(self, offset: int, frame: Frame) -> [float, None]:
+        """Returns the length from the Xing (with LAME) or VBRI header of the first frame, None if there
+        is no such header and -1 if there is a Xing header without the number of frames."""
+        if frame.version == 1:
+            xingOffset = 36 if frame.mode != MONO else 21
+        else:
+            xingOffset = 21 if frame.mode != MONO else 13
+        data = self._read(offset + xingOffset, 8 + 4 + 4 + 100 + 4 + 20 + 27)
+        if data[:4] in (b"Xing", b"Info") and len(data) >= 8:
+            flags = int.from_bytes(data[4:8], "big")
+            position = 8
+            frames = -1
+            if flags & 0x1:
+                frames = int.from_bytes(data[position:position + 4], "big")
+                position += 4
+            for flag, size in [(0x2, 4), (0x4, 100), (0x8, 4)]:
+                if flags & flag:
+                    position += size
+            if position > len(data):
+                raise UnsupportedFile("truncated Xing header")
+            if frames == -1:
+                return -1
+            samples = frame.samples * frames
+            lame = data[position:position + 36]
+            if len(lame) == 36 and self._lameHeader(lame[:20]) and lame[9] >> 4 == 0:
+                delays = int.from_bytes(lame[21:24], "big")
+                samples -= (delays >> 12) + (delays & 0xfff)
+            return max(samples, 0) / frame.sampleRate
+        data = self._read(offset + 36, 26)
+        if data[:4] == b"VBRI" and len(data) == 26 and int.from_bytes(data[4:6], "big") == 1:
+            entrySize = int.from_bytes(data[22:24], "big")
+            tocSize = int.from_bytes(data[18:20], "big") * entrySize
+            if entrySize in (2, 4) and offset + 36 + 26 + tocSize <= self._size:
+                return frame.samples * int.from_bytes(data[14:18], "big") / frame.sampleRate
+        return None
+
+    @staticmethod
+    def _lameHeader(version: bytes) -> bool:
+        """Returns True if the LAME version string is followed by the extended LAME header."""
+        if not version.startswith((b"LAME", b"L3.99")):
+            return False
+        match = re.match(rb"(\d)\.?(\d+)", version.lstrip(b"EMAL"))
+        if match is None:
+            return False
+        release = (int(match.group(1)), int(match.group(2)))
+        return release > (3, 90) or (release == (3, 90) and version[-11:-10] != b"(")
@@ -0,0 +1,81 @@
+"""Builds or updates a library file without the GUI, e.g. to prepare it on another machine:
+python -m musicplayer.scan [folder ...] [--library PATH] [--workers N] ...
+The folders are added to the library, all folders of the library are scanned and the library
+file is saved in the format the player loads on start-up. Nothing from PyQt5 is imported."""
+import argparse
+import os
+import sys
+import time
+
+from musicplayer import library
+
+
+def parseArguments(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m musicplayer.scan",
+                                     description="Scans music folders into a library file without starting the player.")
+    parser.add_argument("folders", nargs="*",
+                        help="folders to add to the library, the folders already in it are scanned as well")
+    parser.add_argument("-l", "--library", default=r"musicplayer\Library.lib",
+                        help="library file to update or create (default: %(default)s, as the player uses it)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="processes reading tags (default: number of CPUs)")
+    parser.add_argument("-t", "--listing-threads", type=int, default=8,
+                        help="directories listed at once (default: %(default)s)")
+    parser.add_argument("-b", "--batch-size", type=int, default=500,
+                        help="songs applied to the library at once (default: %(default)s)")
+    parser.add_argument("-f", "--full", action="store_true",
+                        help="check the files of directories whose modification time did not change")
+    parser.add_argument("--uncompressed", action="store_true",
+                        help="write the library uncompressed, it is memory-mapped when loaded")
+    parser.add_argument("--files-per-second", type=float, default=None, help="limit of files read per second")
+    parser.add_argument("--bytes-per-second", type=float, default=None, help="limit of bytes read per second")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print the progress of the scan")
+    return parser.parse_args(argv)
+
+
+def printProgress(progress: library.ScanProgress, final: bool = False) -> None:
+    elapsed = max(progress.elapsed, 1e-9)
+    eta = progress.eta
+    print(f"{'done' if final else 'scanning'}: {progress.directories} directories, "
+          f"{progress.parsed}/{progress.found} files, {progress.bytesRead / 1e6:.1f} MB read, "
+          f"{progress.parsed / elapsed:.0f} files/s, {progress.bytesRead / 1e6 / elapsed:.1f} MB/s, "
+          f"{elapsed:.1f} s" + ("" if final or eta is None else f", {eta:.0f} s left"))
+
+
+def main(argv: list = None) -> int:
+    arguments = parseArguments(argv)
+    lib = library.Library(workers=arguments.workers, batchSize=arguments.batch_size, scan=False,
+                          libraryFile=arguments.library)
+    lib.listingThreads = arguments.listing_threads
+    lib.compressLibrary = not arguments.uncompressed
+    lib.rateLimiter.filesPerSecond = arguments.files_per_second
+    lib.rateLimiter.bytesPerSecond = arguments.bytes_per_second
+    for folder in arguments.folders:
+        if not os.path.isdir(folder):
+            print(f"not a folder: {folder}", file=sys.stderr)
+            return 2
+        lib.addFolder(os.path.normpath(os.path.abspath(folder)), update=False)
+    if not lib.folders:
+        print("no folders to scan, give at least one", file=sys.stderr)
+        return 2
+
+    progress = library.ScanProgress()
+    lastPrint = time.monotonic()
+    try:
+        for batch in lib.scan(arguments.full, progress):
+            lib.applyBatch(batch)
+            if not arguments.quiet and time.monotonic() - lastPrint >= 1.0:
+                printProgress(progress)
+                lastPrint = time.monotonic()
+    except KeyboardInterrupt:
+        progress.cancel()
+        print("scan interrupted, saving the songs read so far", file=sys.stderr)
+    lib.finishScan()
+    lib.flush()
+    printProgress(progress, final=True)
+    print(f"{len(lib.library)} songs, {len(lib.artists)} artists, {len(lib.albums)} albums in {lib.libraryFile}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
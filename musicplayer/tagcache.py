@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from typing import Iterable
+
+from musicplayer import libraryfile
+
+
+class TagCache:
+    """Tags of files that left the library, keyed by (device, inode, size, mtime in ns) of the file
+    instead of its path, so the tags are not read again when a folder is removed from the library
+    and added back, moved or renamed within the same drive, or when the drive is mounted at another path.
+    Files in the library are not kept, the library has their tags. Entries are dropped after maxAge
+    seconds without being used and, least recently used first, when there are more than maxEntries of them."""
+
+    def __init__(self, maxEntries: int = 100_000, maxAge: float = 90 * 24 * 3600) -> None:
+        self.maxEntries = maxEntries
+        self.maxAge = maxAge
+        self.changed = False
+        self._entries = {}
+        self._lock = threading.Lock()  # entries are used by the scan and saved by the save thread
+
+    @staticmethod
+    def key(path: str, stat: os.stat_result) -> tuple:
+        """Returns the key of a file, stat is refreshed if it lacks the device and inode
+        (os.DirEntry.stat on Windows)."""
+        if not stat.st_ino:
+            stat = os.stat(path)
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> [list, None]:
+        """Returns the 7 attributes stored for the key, None if the file was not read yet."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries[key] = (int(time.time()), entry[1])
+            self.changed = True
+            return list(entry[1])
+
+    def put(self, key: tuple, values: list) -> None:
+        """Stores the 7 attributes of a file, values may be a song record of the library as well."""
+        with self._lock:
+            self._entries[key] = (int(time.time()), values)
+            self.changed = True
+
+    def load(self, path: str, fingerprints: Iterable) -> None:
+        """Loads the saved entries, fingerprints are (size, mtime in ns, inode) of the songs in the library,
+        their entries (saved before the songs were added back) are left out."""
+        try:
+            entries = libraryfile.readTagCache(path)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as error:
+            print(f"tag cache not loaded: {error}")
+            return
+        live = set(fingerprints)
+        with self._lock:
+            for key in [key for key in entries if (key[2], key[3], key[1]) in live]:
+                del entries[key]
+                self.changed = True
+            entries.update(self._entries)
+            self._entries = entries
+
+    def save(self, path: str, fingerprints: Iterable) -> None:
+        """Evicts old entries and writes the rest, fingerprints are (size, mtime in ns, inode)
+        of the songs in the library, their entries are dropped as the library has their tags.
+        Nothing is written unless an entry was used or added since the last save."""
+        live = set(fingerprints)
+        now = int(time.time())
+        with self._lock:
+            if not self.changed:
+                return
+            others = [(used, key, values) for key, (used, values) in self._entries.items()
+                      if (key[2], key[3], key[1]) not in live and now - used <= self.maxAge]
+            others.sort(key=lambda entry: entry[0], reverse=True)
+            del others[self.maxEntries:]
+            kept = {key: (used, values) for used, key, values in others}
+            self._entries = kept
+            self.changed = False
+        try:
+            libraryfile.writeTagCache(path, kept)
+        except OSError as error:
+            print(f"tag cache not saved: {error}")
+            with self._lock:
+                self.changed = True
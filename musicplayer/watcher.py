@@ -0,0 +1,149 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+
+class InotifyWatcher:
+    """Watches the library folders for changes through the Linux inotify API,
+    so that only the changed files have to be read instead of rescanning all folders.
+    The file descriptor returned by fileno becomes readable when events are waiting,
+    read translates them to (kind, path) tuples, kind being one of:
+    "changed" - a file was written or moved into a watched directory,
+    "removed" - a file or a directory was deleted or moved out of a watched directory,
+    "directory" - a directory was created or moved into a watched directory (is watched automatically),
+    "lost" - a watched directory whose parent is not watched (a library folder) was deleted or moved away,
+    "overflow" - the kernel queue overflowed and events were lost, path is None."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    # statfs f_type of network and FUSE file systems, inotify only sees the changes made by this machine there:
+    # nfs, smb, cifs, smb2, fuse, coda, afs, 9p, ceph, ncp
+    REMOTE_FILE_SYSTEMS = frozenset([0x6969, 0x517B, 0xFF534D42, 0xFE534D42, 0x65735546, 0x73757245,
+                                     0x5346414F, 0x01021997, 0x00C36400, 0x564C])
+
+    MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._paths = {}
+        self._descriptors = {}
+
+    @staticmethod
+    def isAvailable() -> bool:
+        return sys.platform.startswith("linux")
+
+    def fileno(self) -> int:
+        return self._fd
+
+    @property
+    def directories(self) -> list:
+        """Returns a list of all watched directories."""
+        return list(self._descriptors)
+
+    def addWatch(self, directory: str) -> bool:
+        """Starts watching a single directory, returns False if it could not be watched."""
+        if directory in self._descriptors:
+            return True
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            return False
+        self._paths[wd] = directory
+        self._descriptors[directory] = wd
+        return True
+
+    def reportsChanges(self, directory: str) -> bool:
+        """Returns False if the directory is on a network or FUSE file system, where changes made
+        by other machines are never reported and the directory has to be scanned periodically."""
+        buffer = ctypes.create_string_buffer(256)  # struct statfs, f_type is its first field
+        if self._libc.statfs(os.fsencode(directory), buffer) < 0:
+            return True
+        return ctypes.c_ulong.from_buffer(buffer).value & 0xFFFFFFFF not in self.REMOTE_FILE_SYSTEMS
+
+    def addTree(self, root: str) -> None:
+        """Starts watching a directory and all of its sub-directories."""
+        if not self.addWatch(root):
+            return
+        for path, subdirs, _ in os.walk(root):
+            for subdir in subdirs:
+                self.addWatch(os.path.join(path, subdir))
+
+    def removeTree(self, root: str) -> None:
+        """Stops watching a directory and all of its sub-directories."""
+        prefix = os.path.join(root, "")
+        for directory in self.directories:
+            if directory == root or directory.startswith(prefix):
+                wd = self._descriptors.pop(directory)
+                del self._paths[wd]
+                self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read(self) -> list:
+        """Reads all waiting events and returns them as a list of (kind, path) tuples."""
+        events = []
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+                offset += self.EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    events.append(("overflow", None))
+                    continue
+                directory = self._paths.get(wd)
+                if mask & self.IN_IGNORED:
+                    if directory is not None and self._descriptors.get(directory) == wd:
+                        del self._descriptors[directory]
+                    self._paths.pop(wd, None)
+                    continue
+                if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                    # other directories are reported by the events of their watched parent
+                    if directory is not None and os.path.dirname(directory) not in self._descriptors:
+                        self.removeTree(directory)
+                        events.append(("lost", directory))
+                    continue
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        self.addTree(path)
+                        events.append(("directory", path))
+                    elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                        self.removeTree(path)
+                        events.append(("removed", path))
+                elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                    events.append(("changed", path))
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    events.append(("removed", path))
+        return events
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1